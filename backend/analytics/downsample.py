@@ -0,0 +1,79 @@
+"""Server-side reduction of long daily price frames to a chart-sized number of points.
+
+- ``lttb``: Largest-Triangle-Three-Buckets on the close (x = calendar day). Picks
+  real rows, keeps the first and last bar and the visually significant extremes,
+  which suits close-line charts.
+- ``ohlc``: consecutive bars merged into equal-count buckets (open of the first bar,
+  high / low over the bucket, close of the last, summed volume), dated by the
+  bucket's first bar, which suits candlestick charts.
+
+Both work on NumPy arrays. LTTB loops once per output bucket (each step is a
+vectorized argmax over that bucket's rows), never once per input row.
+"""
+from __future__ import annotations
+
+from ..lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+METHODS = ('lttb', 'ohlc')
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the ``n_out`` points LTTB keeps from the series (x ascending)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out - 2 buckets over the interior points; first / last point are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # the "third point" for bucket i is the mean of bucket i + 1 (the last point for the final bucket)
+    sizes = ends - starts
+    avg_x = np.add.reduceat(x[:n - 1], starts) / sizes
+    avg_y = np.add.reduceat(y[:n - 1], starts) / sizes
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(len(starts)):
+        s, e = starts[i], ends[i]
+        bx, by = x[s:e], y[s:e]
+        # twice the triangle area (a, candidate, next-bucket mean)
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = s + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        out[i + 1] = a
+    return out
+
+def ohlc_buckets(df: pd.DataFrame, n_out: int) -> pd.DataFrame:
+    """Aggregate consecutive bars into ``n_out`` OHLCV candles."""
+    n = len(df)
+    if n_out >= n:
+        return df
+    starts = np.unique(np.linspace(0, n, n_out + 1).astype(np.int64)[:-1])
+    ends = np.append(starts[1:], n)
+    out = df.iloc[ends - 1].copy()  # close and any extra columns from the bucket's last bar
+    if 'open' in df.columns:
+        out['open'] = df['open'].to_numpy()[starts]
+    if 'high' in df.columns:
+        out['high'] = np.fmax.reduceat(df['high'].to_numpy(dtype=float), starts)
+    if 'low' in df.columns:
+        out['low'] = np.fmin.reduceat(df['low'].to_numpy(dtype=float), starts)
+    if 'volume' in df.columns:
+        out['volume'] = np.add.reduceat(np.nan_to_num(df['volume'].to_numpy(dtype=float)), starts)
+    if 'bars' in df.columns:  # rollup bars (storage.rollups)
+        out['bars'] = np.add.reduceat(df['bars'].to_numpy(dtype=np.int64), starts)
+        out['first_date'] = df['first_date'].to_numpy()[starts]
+    out.index = df.index[starts]
+    return out
+
+def downsample_frame(df: pd.DataFrame, max_points: int, method: str = 'lttb') -> pd.DataFrame:
+    """``df`` (DatetimeIndex, daily bars) reduced to at most ``max_points`` rows."""
+    if max_points is None or len(df) <= max_points:
+        return df
+    if method == 'ohlc':
+        return ohlc_buckets(df, max_points)
+    x = df.index.values.astype('datetime64[D]').astype(np.int64)
+    return df.iloc[lttb_indices(x, df['close'].to_numpy(dtype=float), max_points)]
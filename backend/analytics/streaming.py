@@ -0,0 +1,115 @@
+"""Incremental summary statistics for a price window whose last bar keeps changing.
+
+During market hours only today's bar moves between refreshes, so the window
+statistics are split into a frozen prefix (all rows but the last) and the last
+bar. The prefix keeps running sums, the running max / worst drawdown and Welford
+moments of its returns. Replacing the last bar is then O(1). Any change to the
+prefix (a new trading day, a different window, a corrected close or volume anywhere
+before the last bar) rebuilds the state from the frame; the prefix is identified by
+a vectorized hash of its dates, closes and volumes.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+
+from ..lazy import lazy_import
+from ..schemas.stocks import StockAnalysisSummary
+
+pd = lazy_import("pandas")
+
+class IncrementalSummary:
+    """``StockAnalysisSummary`` over a window, with O(1) updates of the last bar."""
+
+    def __init__(self, closes, volumes):
+        closes = [float(c) for c in closes]
+        volumes = [float(v) for v in volumes]
+        if not closes:
+            raise ValueError("window must contain at least one row")
+        prefix = closes[:-1]
+        self.n = len(closes)
+        self.first_close = closes[0]
+        self.prev_close = prefix[-1] if prefix else None
+        self.prefix_close_sum = math.fsum(prefix)
+        self.prefix_volume_sum = math.fsum(volumes[:-1])
+        # running max and worst drawdown over the prefix
+        self.prefix_max = -math.inf
+        self.prefix_min_dd = 0.0
+        for c in prefix:
+            self.prefix_max = max(self.prefix_max, c)
+            self.prefix_min_dd = min(self.prefix_min_dd, c / self.prefix_max - 1)
+        # Welford over the prefix returns
+        self.r_n, self.r_mean, self.r_m2 = 0, 0.0, 0.0
+        for a, b in zip(prefix, prefix[1:]):
+            self.r_n, self.r_mean, self.r_m2 = self._welford(self.r_n, self.r_mean, self.r_m2, b / a - 1)
+        self.update_last(closes[-1], volumes[-1])
+
+    @staticmethod
+    def _welford(n, mean, m2, x):
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        return n, mean, m2 + delta * (x - mean)
+
+    def update_last(self, close: float, volume: float):
+        """Replace the last bar's close / volume."""
+        self.last_close = float(close)
+        self.last_volume = float(volume)
+
+    def summary(self, last_close: float | None = None, last_volume: float | None = None) -> StockAnalysisSummary:
+        """Summary for the current last bar, or for the given one without storing it."""
+        c = self.last_close if last_close is None else float(last_close)
+        v = self.last_volume if last_volume is None else float(last_volume)
+        if self.prev_close is None:  # single-row window: the last bar is also the first
+            first, max_dd, vol = c, 0.0, math.nan
+        else:
+            first = self.first_close
+            peak = max(self.prefix_max, c)
+            max_dd = min(self.prefix_min_dd, c / peak - 1)
+            n, _, m2 = self._welford(self.r_n, self.r_mean, self.r_m2, c / self.prev_close - 1)
+            vol = math.sqrt(m2 / (n - 1)) if n > 1 else math.nan
+        return StockAnalysisSummary(
+            count=self.n,
+            mean_close=(self.prefix_close_sum + c) / self.n,
+            vol_mean=(self.prefix_volume_sum + v) / self.n,
+            return_pct=(c / first - 1) * 100,
+            max_drawdown_pct=max_dd * 100,
+            volatility_pct=vol * 100,
+        )
+
+def _frame_columns(df: pd.DataFrame):
+    close = df['close'] if 'close' in df.columns else df['Close']
+    volume = df['volume'] if 'volume' in df.columns else df.get('Volume', close*0)
+    return close, volume
+
+_MAX_STATES = 4096
+_states: OrderedDict = OrderedDict()  # (symbol, market, days) -> (prefix signature, IncrementalSummary)
+_lock = threading.Lock()
+
+def _signature(df: pd.DataFrame, close, volume) -> tuple:
+    """Identifies the frozen prefix: its length and a hash of its dates, closes and volumes."""
+    if len(df) < 2:
+        return (len(df),)
+    prefix = pd.DataFrame({'close': close.iloc[:-1].to_numpy(), 'volume': volume.iloc[:-1].to_numpy()},
+                          index=df.index[:-1])
+    return (len(df), int(pd.util.hash_pandas_object(prefix).sum()))
+
+def window_summary(symbol: str, market: str, days: int, df: pd.DataFrame) -> StockAnalysisSummary:
+    """Summary of ``df`` (the trimmed window), reusing prefix state when only the last bar moved."""
+    close, volume = _frame_columns(df)
+    key = (symbol, market, days)
+    sig = _signature(df, close, volume)
+    with _lock:
+        entry = _states.get(key)
+        if entry is not None:
+            _states.move_to_end(key)
+    if entry is not None and entry[0] == sig:
+        # O(1): only the last bar differs (summary() does not mutate shared state)
+        return entry[1].summary(close.iloc[-1], volume.iloc[-1])
+    state = IncrementalSummary(close.tolist(), volume.tolist())
+    with _lock:
+        _states[key] = (sig, state)
+        while len(_states) > _MAX_STATES:
+            _states.popitem(last=False)
+    return state.summary()
@@ -0,0 +1,101 @@
+"""Vectorized cross-sectional summaries for many symbols at once.
+
+``summarize_matrix`` takes aligned close / volume matrices (rows = dates, columns =
+symbols) and computes the ``StockAnalysisSummary`` metrics for every column in a
+few NumPy passes. Symbols with shorter histories are NaN-padded; each column uses
+only its own valid rows, so results match ``StockAnalysisSummary.from_dataframe``
+on that symbol's frame.
+"""
+from __future__ import annotations
+
+from ..lazy import lazy_import
+from ..schemas.stocks import StockAnalysisSummary
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+FIELDS = ('count', 'mean_close', 'vol_mean', 'return_pct', 'max_drawdown_pct', 'volatility_pct')
+
+def _metrics(close: np.ndarray, volume: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-column metrics for a (T, N) float matrix; NaN marks missing rows."""
+    valid = ~np.isnan(close)
+    count = valid.sum(axis=0)
+    has = count > 0
+    T = close.shape[0]
+    first = np.argmax(valid, axis=0)
+    last = T - 1 - np.argmax(valid[::-1], axis=0)
+    cols = np.arange(close.shape[1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_close = np.where(has, np.nansum(close, axis=0) / np.maximum(count, 1), np.nan)
+        vol_valid = valid & ~np.isnan(volume)
+        vol_mean = np.where(vol_valid.any(axis=0),
+                            np.where(vol_valid, volume, 0).sum(axis=0) / np.maximum(vol_valid.sum(axis=0), 1), np.nan)
+        ret_pct = (close[last, cols] / close[first, cols] - 1) * 100
+        # fmax skips NaN, so the running max carries over gaps
+        rolling_max = np.fmax.accumulate(close, axis=0)
+        drawdown = close / rolling_max - 1
+        max_dd = np.where(has, np.nanmin(np.where(valid, drawdown, np.inf), axis=0), np.nan) * 100
+        # each return is against the column's previous valid close, so a date on which only
+        # other symbols traded does not drop the return across it
+        prev_idx = np.maximum.accumulate(np.where(valid, np.arange(T)[:, None], 0), axis=0)
+        prev = close[prev_idx, cols]
+        rets = close[1:] / prev[:-1] - 1
+        r_valid = ~np.isnan(rets)
+        n_r = r_valid.sum(axis=0)
+        r0 = np.where(r_valid, rets, 0.0)
+        r_mean = r0.sum(axis=0) / np.maximum(n_r, 1)
+        ss = (np.where(r_valid, rets - r_mean, 0.0) ** 2).sum(axis=0)
+        vol_pct = np.where(n_r > 1, np.sqrt(ss / np.maximum(n_r - 1, 1)), np.nan) * 100
+    return {
+        'count': count,
+        'mean_close': mean_close,
+        'vol_mean': vol_mean,
+        'return_pct': np.where(has, ret_pct, np.nan),
+        'max_drawdown_pct': np.where(np.isinf(max_dd), np.nan, max_dd),
+        'volatility_pct': vol_pct,
+    }
+
+def summarize_matrix(close, volume=None, windows: tuple[int, ...] = ()) -> pd.DataFrame:
+    """Summaries for each column of ``close`` (DataFrame or 2-D array, rows oldest first).
+
+    ``windows`` adds the same metrics over each column's last ``w`` valid rows as
+    ``<field>_<w>d`` columns. Returns a DataFrame indexed by symbol (column labels of ``close``).
+    """
+    labels = close.columns if isinstance(close, pd.DataFrame) else pd.RangeIndex(np.shape(close)[1])
+    c = np.asarray(close, dtype=float)
+    if c.ndim != 2:
+        raise ValueError("close must be a 2-D (dates x symbols) matrix")
+    v = np.zeros_like(c) if volume is None else np.asarray(volume, dtype=float)
+    if v.shape != c.shape:
+        raise ValueError("close and volume must have the same shape")
+    out = {k: arr for k, arr in _metrics(c, v).items()}
+    valid = ~np.isnan(c)
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]  # valid rows at or after each row, per column
+    for w in windows:
+        in_window = valid & (from_end <= w)
+        for k, arr in _metrics(np.where(in_window, c, np.nan), np.where(in_window, v, np.nan)).items():
+            out[f"{k}_{w}d"] = arr
+    return pd.DataFrame(out, index=labels)
+
+def align_frames(frames: list[pd.DataFrame]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Align per-symbol OHLCV frames (DatetimeIndex) into close / volume matrices.
+
+    Column ``i`` of both matrices belongs to ``frames[i]``.
+    """
+    keys = range(len(frames))
+    close = pd.concat([df['close'] for df in frames], axis=1, keys=keys).sort_index()
+    volume = pd.concat([df['volume'] for df in frames], axis=1, keys=keys).reindex(close.index)
+    return close, volume
+
+def summarize_frames(frames: dict) -> dict:
+    """``{key: StockAnalysisSummary}`` for non-empty per-symbol frames, in one pass."""
+    frames = {k: df for k, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return {}
+    close, volume = align_frames(list(frames.values()))
+    table = summarize_matrix(close, volume)
+    return {key: to_summary(row) for key, row in zip(frames, table.itertuples(index=False))}
+
+def to_summary(row) -> StockAnalysisSummary:
+    """Convert one row of ``summarize_matrix`` output to a ``StockAnalysisSummary``."""
+    return StockAnalysisSummary(**{k: (int(getattr(row, k)) if k == 'count' else float(getattr(row, k))) for k in FIELDS})
@@ -0,0 +1,142 @@
+"""Benchmark: storage/db.py under many parallel readers (plus one writer).
+
+Each profile runs in its own process on a scratch SQLite file:
+
+- ``tuned``: the defaults (WAL, synchronous=NORMAL, mmap, pooled connections,
+  covering indexes).
+- ``legacy``: rollback journal, synchronous=FULL, no mmap and the covering indexes
+  dropped, i.e. the storage profile before tuning.
+
+Reader threads alternate ``load_prices`` (120-day window) and ``load_news`` while a
+writer thread upserts prices and adds headlines; reads/s, read latency and
+writes/s are reported per profile.
+
+Run from the repository root:
+    python -m backend.bench.bench_db_concurrency [--readers 16] [--seconds 5] [--no-writer]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = {
+    "legacy": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_MMAP_BYTES": "0"},
+    "tuned": {},
+}
+
+
+def _worker(args) -> dict:
+    import random
+    from datetime import date, datetime, timedelta
+
+    from ..storage import db
+
+    db.init_schema()
+    if args.profile == "legacy":
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_prices_covering")
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_news_covering")
+
+    today = date.today()
+    symbols = [f"S{k:03d}" for k in range(args.symbols)]
+    now = datetime.utcnow()
+    for sym in symbols:
+        db.upsert_prices([{"symbol": sym, "market": "US", "date": today - timedelta(days=d), "open": 1.0, "high": 2.0,
+                           "low": 0.5, "close": 1.5, "volume": 1000} for d in range(args.days)])
+        db.add_news_items(sym, "US", [{"published_at": now - timedelta(hours=h), "text": f"{sym} {h}"} for h in range(10)])
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    writes = [0]
+    errors = [0]
+    lock = threading.Lock()
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        local = []
+        while not stop.is_set():
+            sym = rng.choice(symbols)
+            t0 = time.perf_counter()
+            try:
+                if len(local) % 2:
+                    db.load_news(sym, "US")
+                else:
+                    db.load_prices(sym, "US", today - timedelta(days=120), today)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    def writer():
+        rng = random.Random(0)
+        n = 0
+        while not stop.is_set():
+            sym = rng.choice(symbols)
+            try:
+                db.upsert_prices([{"symbol": sym, "market": "US", "date": today, "open": 1.0, "high": 2.0,
+                                   "low": 0.5, "close": 1.0 + n % 7, "volume": n}])
+                db.add_news_items(sym, "US", [{"published_at": datetime.utcnow(), "text": f"w{n}"}])
+                n += 1
+            except Exception:
+                with lock:
+                    errors[0] += 1
+        writes[0] = n
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    if not args.no_writer:
+        threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    ms = sorted(x * 1000 for x in latencies) or [0.0]
+    return {
+        "profile": args.profile,
+        "reads_per_s": len(latencies) / args.seconds,
+        "read_p50_ms": ms[len(ms) // 2],
+        "read_p99_ms": ms[min(len(ms) - 1, int(len(ms) * 0.99))],
+        "writes_per_s": writes[0] / args.seconds,
+        "errors": errors[0],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--readers", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--days", type=int, default=1000, help="history per symbol")
+    ap.add_argument("--no-writer", action="store_true")
+    ap.add_argument("--profile", choices=sorted(PROFILES), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.profile:  # child process: env already set up by the parent
+        print(json.dumps(_worker(args)))
+        return
+
+    print(f"{args.readers} readers, {'no' if args.no_writer else '1'} writer, {args.seconds:g}s per profile")
+    print(f"{'profile':<8} {'reads/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'writes/s':>9} {'errors':>7}")
+    for name, env in PROFILES.items():
+        tmpdir = tempfile.mkdtemp(prefix="mcpilot-bench-")
+        child_env = {**os.environ, **env, "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"}
+        cmd = [sys.executable, "-m", "backend.bench.bench_db_concurrency", "--profile", name,
+               "--readers", str(args.readers), "--seconds", str(args.seconds),
+               "--symbols", str(args.symbols), "--days", str(args.days)] + (["--no-writer"] if args.no_writer else [])
+        out = subprocess.run(cmd, env=child_env, capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<8} {r['reads_per_s']:>10,.0f} {r['read_p50_ms']:>8.3f} {r['read_p99_ms']:>8.3f} "
+              f"{r['writes_per_s']:>9,.0f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark: SQLite ``prices`` table vs columnar price stores (write + range read).
+
+Writes N symbols of synthetic daily history into each backend, then times full
+and recent-window reads through ``PriceStore.load_frame``.
+
+Run from the repository root (needs pyarrow for the columnar backends):
+    python -m backend.bench.bench_price_store [--symbols 20] [--years 10] [--reads 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="mcpilot-bench-")
+# always a scratch database / directory
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import numpy as np
+import pandas as pd
+
+from ..storage import db
+from ..storage.price_store import make_price_store
+
+
+def _make_frame(days: int, seed: int) -> pd.DataFrame:
+    idx = pd.bdate_range(end=pd.Timestamp(date.today()), periods=days)
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(days).cumsum()
+    return pd.DataFrame({
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": rng.integers(1_000, 1_000_000, days),
+    }, index=idx)
+
+
+def run(n_symbols: int, years: int, reads: int) -> list[dict]:
+    db.init_schema()
+    days = years * 252
+    frames = [(f"SYM{i}", _make_frame(days, i)) for i in range(n_symbols)]
+    end = date.today()
+    windows = {"full": end - timedelta(days=years * 366), "60d": end - timedelta(days=120)}
+    results = []
+    for kind in ("sqlite", "parquet", "arrow"):
+        try:
+            store = make_price_store(kind, os.path.join(_tmpdir, kind))
+        except RuntimeError as e:
+            print(f"skip {kind}: {e}")
+            continue
+        t0 = time.perf_counter()
+        for sym, df in frames:
+            store.upsert_frame(sym, "US", df)
+        write_s = time.perf_counter() - t0
+        res = {"backend": kind, "rows": days * n_symbols, "write_rows_per_s": days * n_symbols / write_s}
+        for label, start in windows.items():
+            t0 = time.perf_counter()
+            for i in range(reads):
+                sym = frames[i % n_symbols][0]
+                store.load_frame(sym, "US", start, end)
+            res[f"read_{label}_ms"] = (time.perf_counter() - t0) / reads * 1000
+        results.append(res)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--symbols", type=int, default=20)
+    ap.add_argument("--years", type=int, default=10)
+    ap.add_argument("--reads", type=int, default=200)
+    args = ap.parse_args()
+    print(f"{'backend':>8} {'rows':>9} {'write rows/s':>13} {'full read ms':>13} {'60d read ms':>12}")
+    for r in run(args.symbols, args.years, args.reads):
+        print(f"{r['backend']:>8} {r['rows']:>9,} {r['write_rows_per_s']:>13,.0f} {r['read_full_ms']:>13.2f} {r['read_60d_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
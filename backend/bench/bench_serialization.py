@@ -0,0 +1,84 @@
+"""Benchmark: ``/stocks/{symbol}`` body serialization time and payload size per format.
+
+Times the row format (reset_index + ``to_dict(orient="records")`` + Pydantic
+validation + JSON) against the columnar JSON, MessagePack and Arrow IPC
+encodings, and reports raw / gzip / brotli payload sizes.
+
+Run from the repository root (msgpack, pyarrow and brotli are optional):
+    python -m backend.bench.bench_serialization [--sizes 60 1000 10000] [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="mcpilot-bench-")
+# always a scratch database
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from .. import encoding
+from ..routers import stocks
+from ..schemas.stocks import StockAnalysisSummary
+
+
+def _make_frame(rows: int) -> pd.DataFrame:
+    idx = pd.bdate_range(end="2024-06-28", periods=rows)
+    rng = np.random.default_rng(rows)
+    close = 100 * np.exp(rng.standard_normal(rows).cumsum() * 0.01)
+    return pd.DataFrame({
+        "open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+        "volume": rng.integers(1_000, 10_000_000, rows),
+    }, index=idx)
+
+
+def _timeit(fn, repeat: int) -> tuple[float, bytes]:
+    body = fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000, body
+
+
+def run(sizes: list[int], repeat: int) -> list[dict]:
+    names = {"name_en": "Bench Corp", "name_zh": None}  # no network
+    results = []
+    for rows in sizes:
+        df = _make_frame(rows)
+        summary = StockAnalysisSummary.from_dataframe(df)
+        meta = {"symbol": "BENCH", "market": "US", "start": str(df.index.min().date()),
+                "end": str(df.index.max().date()), "summary": summary.model_dump(),
+                "company_name_en": "Bench Corp", "company_name_zh": None}
+        cases = {"rows": lambda: stocks._daily_response("BENCH", "US", df, summary, names).model_dump_json().encode()}
+        for fmt in ("columnar", "msgpack", "arrow"):
+            cases[fmt] = lambda fmt=fmt: encoding.encode_frame(fmt, df, meta)
+        for fmt, fn in cases.items():
+            try:
+                ms, body = _timeit(fn, repeat)
+            except HTTPException as e:
+                print(f"skip {fmt}: {e.detail}")
+                continue
+            res = {"format": fmt, "rows": rows, "encode_ms": ms, "bytes": len(body),
+                   "gzip_bytes": len(encoding.compress(body, "gzip")), "br_bytes": None}
+            if encoding.brotli is not None:
+                res["br_bytes"] = len(encoding.compress(body, "br"))
+            results.append(res)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[60, 1_000, 10_000])
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+    print(f"{'format':>9} {'rows':>7} {'encode ms':>10} {'bytes':>10} {'gzip':>10} {'brotli':>10}")
+    for r in run(args.sizes, args.repeat):
+        br = f"{r['br_bytes']:>10,}" if r['br_bytes'] is not None else f"{'-':>10}"
+        print(f"{r['format']:>9} {r['rows']:>7,} {r['encode_ms']:>10.3f} {r['bytes']:>10,} {r['gzip_bytes']:>10,} {br}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Startup benchmark: ``import backend.main`` and time to the first ``/health`` answer.
+
+Each run uses a fresh interpreter and a scratch database:
+
+- import: wall time of ``import backend.main`` measured inside the child, plus the
+  heavy modules (pandas, numpy, yfinance, ...) that import pulled in; those must
+  stay lazy, so any of them showing up counts as a regression.
+- health: from spawning ``uvicorn backend.main:app`` until ``GET /health`` returns
+  200 (includes interpreter start, the import and the lifespan's schema creation).
+
+The medians are checked against the budgets; the exit status is 1 when over.
+
+Run from the repository root:
+    python -m backend.bench.bench_startup [--runs 5] [--import-budget-ms 1200] [--health-budget-ms 3000]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# must not be imported by `import backend.main` (loaded on first use instead)
+LAZY_MODULES = ("pandas", "numpy", "yfinance", "pyarrow", "msgpack", "langchain", "akshare")
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _env() -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="mcpilot-bench-")
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+            "PREFETCH_WATCHLIST": "", "PYTHONWARNINGS": "ignore"}
+
+
+def measure_import() -> dict:
+    out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], env=_env(), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_health(timeout: float = 30.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+                             "--log-level", "warning"], env=_env(),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/health not answering after {timeout:g}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--import-budget-ms", type=float, default=1200.0)
+    ap.add_argument("--health-budget-ms", type=float, default=3000.0)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    health = [measure_health() for _ in range(args.runs)]
+    loaded = sorted({m for r in imports for m in r["loaded"]})
+    result = {
+        "import_ms": statistics.median(r["seconds"] for r in imports) * 1000,
+        "health_ms": statistics.median(health) * 1000,
+        "eagerly_loaded": loaded,
+        "budget": {"import_ms": args.import_budget_ms, "health_ms": args.health_budget_ms},
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    if result["import_ms"] > args.import_budget_ms:
+        failures.append(f"import backend.main {result['import_ms']:.0f} ms > budget {args.import_budget_ms:.0f} ms")
+    if result["health_ms"] > args.health_budget_ms:
+        failures.append(f"first /health {result['health_ms']:.0f} ms > budget {args.health_budget_ms:.0f} ms")
+    if loaded:
+        failures.append(f"imported eagerly: {', '.join(loaded)}")
+    print(f"import backend.main   {result['import_ms']:8.1f} ms  (budget {args.import_budget_ms:.0f})")
+    print(f"first /health         {result['health_ms']:8.1f} ms  (budget {args.health_budget_ms:.0f})")
+    print(f"heavy modules loaded  {', '.join(loaded) or 'none'}")
+    for line in failures:
+        print("REGRESSION " + line, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Offline benchmark suite: FastAPI routes and ``storage/db.py`` against local fakes.
+
+yfinance, the Yahoo screener / RSS feed and Ollama are replaced by the
+deterministic stand-ins in ``bench/fakes.py`` (optionally with injected latency),
+the database is a scratch SQLite file. Each route is timed cold (nothing cached
+for that request) and warm (repeated request); results and upstream call counts
+are written as JSON so runs of different versions can be compared.
+
+Run from the repository root:
+    python -m backend.bench.bench_suite [--iterations 30] [--yf-latency-ms 0] [--json out.json]
+    python -m backend.bench.bench_suite --baseline old.json [--threshold 1.25]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="mcpilot-bench-")
+# always a scratch database / price store
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["PRICE_STORE_PATH"] = os.path.join(_tmpdir, "prices")
+os.environ.setdefault("LLM_MODE", "local")
+
+from fastapi.testclient import TestClient
+
+from . import fakes
+from ..main import app
+from ..routers import stocks
+from ..storage import db
+
+SCHEMA_VERSION = 1
+
+
+def _stats(samples: list[float]) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": ms[len(ms) // 2],
+        "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+        "min_ms": ms[0],
+        "max_ms": ms[-1],
+    }
+
+
+def _measure(fn, iterations: int, setup=None) -> list[float]:
+    samples = []
+    for i in range(iterations):
+        if setup is not None:
+            setup(i)
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _route_cases(client: TestClient) -> list[tuple]:
+    """(name, variant, request(i), setup(i) or None)."""
+    def ok(resp):
+        if resp.status_code != 200:
+            raise RuntimeError(f"{resp.request.method} {resp.request.url} -> {resp.status_code}: {resp.text[:200]}")
+        return resp
+
+    def clear_movers(i):
+        stocks._movers_cache._entries.clear()
+
+    def clear_earnings(i):
+        with db.engine.begin() as conn:
+            conn.execute(db.earnings_calendar.delete())
+
+    def expire_news(i):
+        with db.engine.begin() as conn:
+            conn.execute(db.news_refresh.update().values(fetched_at=datetime.utcnow() - timedelta(days=1)))
+
+    analysis_body = {"symbol": "WARM", "market": "US", "days": 60, "language": "en"}
+    return [
+        ("GET /stocks/{symbol}", "cold", lambda i: ok(client.get(f"/stocks/COLD{i}")), None),
+        ("GET /stocks/{symbol}", "warm", lambda i: ok(client.get("/stocks/WARM")), None),
+        ("GET /stocks/movers", "cold", lambda i: ok(client.get("/stocks/movers")), clear_movers),
+        ("GET /stocks/movers", "warm", lambda i: ok(client.get("/stocks/movers")), None),
+        ("GET /stocks/{symbol}/news", "cold", lambda i: ok(client.get(f"/stocks/NEWS{i}/news")), None),
+        ("GET /stocks/{symbol}/news", "warm", lambda i: ok(client.get("/stocks/WARM/news")), None),
+        ("GET /stocks/{symbol}/news", "revalidate", lambda i: ok(client.get("/stocks/WARM/news")), expire_news),
+        ("GET /stocks/upcoming_earnings", "cold", lambda i: ok(client.get("/stocks/upcoming_earnings")), clear_earnings),
+        ("GET /stocks/upcoming_earnings", "warm", lambda i: ok(client.get("/stocks/upcoming_earnings")), None),
+        ("POST /analysis/", "cold",
+         lambda i: ok(client.post("/analysis/", json={**analysis_body, "question": f"q{i}"})), None),
+        ("POST /analysis/", "warm", lambda i: ok(client.post("/analysis/", json=analysis_body)), None),
+    ]
+
+
+def bench_routes(iterations: int, counters: dict) -> list[dict]:
+    client = TestClient(app)  # no lifespan: keeps the fake HTTP client installed
+    results = []
+    for name, variant, request, setup in _route_cases(client):
+        if variant == "warm":
+            request(-1)  # prime
+        before = dict(counters)
+        samples = _measure(request, iterations, setup)
+        calls = {k: v - before.get(k, 0) for k, v in counters.items() if v != before.get(k, 0)}
+        results.append({"group": "route", "name": name, "variant": variant, **_stats(samples),
+                        "upstream_calls": calls})
+    return results
+
+
+def _price_rows(symbol: str, n: int, end: date) -> list[dict]:
+    return [{"symbol": symbol, "market": "US", "date": end - timedelta(days=n - k), "open": 1.0 + k,
+             "high": 2.0 + k, "low": 0.5 + k, "close": 1.5 + k, "volume": 1000 + k} for k in range(n)]
+
+
+def _storage_cases() -> list[tuple]:
+    today = date.today()
+    now = datetime.utcnow()
+    db.upsert_prices(_price_rows("LOADP", 2500, today))
+    db.add_news_items("LOADN", "US", [{"published_at": now - timedelta(hours=k), "text": f"n{k}"} for k in range(50)])
+    db.upsert_earnings([{"symbol": f"E{k}", "market": "US", "earnings_date": today + timedelta(days=k % 30),
+                         "name": f"E{k}", "session": None, "updated_at": now} for k in range(200)])
+    for k in range(100):
+        db.put_llm_response({"key": f"k{k}", "provider": "local", "model": "m", "language": "en",
+                             "response": "x" * 500, "created_at": now, "last_used_at": now}, max_entries=1000)
+    news = [{"published_at": now - timedelta(minutes=k), "text": f"headline {k}"} for k in range(10)]
+    return [
+        ("upsert_prices", "1000 rows", lambda i: db.upsert_prices(_price_rows(f"UP{i}", 1000, today))),
+        ("upsert_prices", "overwrite 1000 rows", lambda i: db.upsert_prices(_price_rows("UPSAME", 1000, today))),
+        ("load_prices", "120 days of 2500", lambda i: db.load_prices("LOADP", "US", today - timedelta(days=120), today)),
+        ("load_prices", "full 2500", lambda i: db.load_prices("LOADP", "US", today - timedelta(days=3000), today)),
+        ("price_symbols", "", lambda i: db.price_symbols()),
+        ("add_coverage", "", lambda i: db.add_coverage(f"COV{i}", "US", today - timedelta(days=200), today)),
+        ("load_coverage", "", lambda i: db.load_coverage("COV0", "US")),
+        ("add_news_items", "10 items", lambda i: db.add_news_items(f"N{i}", "US", news)),
+        ("load_news", "", lambda i: db.load_news("LOADN", "US")),
+        ("upsert_earnings", "40 rows", lambda i: db.upsert_earnings(
+            [{"symbol": f"E{k}", "market": "US", "earnings_date": today, "name": None, "session": None,
+              "updated_at": now} for k in range(40)])),
+        ("load_upcoming_earnings", "", lambda i: db.load_upcoming_earnings("US", today, today + timedelta(days=14), 50)),
+        ("earnings_refreshed_at", "", lambda i: db.earnings_refreshed_at("US")),
+        ("put_llm_response", "", lambda i: db.put_llm_response(
+            {"key": f"p{i}", "provider": "local", "model": "m", "language": "en", "response": "y" * 500,
+             "created_at": now, "last_used_at": now}, max_entries=1000)),
+        ("get_llm_response", "hit", lambda i: db.get_llm_response(f"k{i % 100}", now - timedelta(days=1))),
+    ]
+
+
+def bench_storage(iterations: int) -> list[dict]:
+    results = []
+    for name, variant, fn in _storage_cases():
+        fn(-1)  # warm up statement caches
+        results.append({"group": "storage", "name": name, "variant": variant, **_stats(_measure(fn, iterations))})
+    return results
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(iterations: int, storage_iterations: int, latency: fakes.Latency) -> dict:
+    db.init_schema()  # TestClient without the lifespan
+    counters = fakes.install(latency)
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "storage_iterations": storage_iterations,
+            "latency_s": vars(latency),
+        },
+        "results": bench_routes(iterations, counters) + bench_storage(storage_iterations),
+    }
+
+
+def _key(r: dict) -> tuple:
+    return (r["group"], r["name"], r["variant"])
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Cases whose p50 grew by more than ``threshold`` x against the baseline."""
+    old = {_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        b = old.get(_key(r))
+        if b is None or b["p50_ms"] <= 0:
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"]
+        if ratio > threshold:
+            regressions.append(f"{r['name']} [{r['variant']}]: p50 {b['p50_ms']:.3f} -> {r['p50_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--iterations", type=int, default=30, help="requests per route and variant")
+    ap.add_argument("--storage-iterations", type=int, default=200)
+    ap.add_argument("--yf-latency-ms", type=float, default=0.0)
+    ap.add_argument("--screener-latency-ms", type=float, default=0.0)
+    ap.add_argument("--rss-latency-ms", type=float, default=0.0)
+    ap.add_argument("--ollama-latency-ms", type=float, default=0.0)
+    ap.add_argument("--json", help="write results to this file ('-' for stdout)")
+    ap.add_argument("--baseline", help="earlier --json output to compare p50 latencies against")
+    ap.add_argument("--threshold", type=float, default=1.25, help="p50 ratio reported as a regression")
+    args = ap.parse_args()
+    latency = fakes.Latency(
+        yfinance=args.yf_latency_ms / 1000, screener=args.screener_latency_ms / 1000,
+        rss=args.rss_latency_ms / 1000, ollama=args.ollama_latency_ms / 1000,
+    )
+    report = run(args.iterations, args.storage_iterations, latency)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        print(f"{'case':<34} {'variant':<20} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}  upstream calls")
+        for r in report["results"]:
+            calls = ", ".join(f"{k}={v}" for k, v in r.get("upstream_calls", {}).items())
+            print(f"{r['name']:<34} {r['variant']:<20} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['mean_ms']:>9.3f}  {calls}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
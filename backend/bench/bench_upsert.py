@@ -0,0 +1,118 @@
+"""Benchmark: price upsert throughput (rows/sec).
+
+Compares the legacy per-row DELETE + INSERT loop with the set-based
+``upsert_prices`` / ``upsert_price_frame`` path on a throwaway SQLite file.
+
+Run from the repository root:
+    python -m backend.bench.bench_upsert [--sizes 1000,100000,1000000] [--legacy-max 100000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="mcpilot-bench-")
+# always a scratch database: the benchmark clears the prices table
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import numpy as np
+import pandas as pd
+
+from ..storage import db
+
+
+# pandas timestamps stop at 2262, so large loads are spread over several symbols
+_MAX_DAYS_PER_SYMBOL = 100_000
+
+
+def _make_frame(n: int) -> pd.DataFrame:
+    idx = pd.date_range("1900-01-01", periods=n, freq="D")
+    rng = np.random.default_rng(42)
+    close = 100 + rng.standard_normal(n).cumsum()
+    return pd.DataFrame({
+        "open": close + rng.standard_normal(n),
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": rng.integers(1_000, 1_000_000, n),
+    }, index=idx)
+
+
+def _legacy_upsert(rows):
+    with db.engine.begin() as conn:
+        for r in rows:
+            conn.execute(db.prices.delete().where(
+                (db.prices.c.symbol==r['symbol']) &
+                (db.prices.c.market==r['market']) &
+                (db.prices.c.date==r['date'])
+            ))
+            conn.execute(db.prices.insert().values(**r))
+
+
+def _make_frames(n: int) -> list[tuple[str, pd.DataFrame]]:
+    frames = []
+    done = 0
+    while done < n:
+        k = min(_MAX_DAYS_PER_SYMBOL, n - done)
+        frames.append((f"BENCH{n}_{len(frames)}", _make_frame(k)))
+        done += k
+    return frames
+
+
+def _bulk(frames):
+    for sym, df in frames:
+        db.upsert_price_frame(sym, "US", df)
+
+
+def _clear():
+    with db.engine.begin() as conn:
+        conn.execute(db.prices.delete())
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def run(sizes: list[int], legacy_max: int) -> list[dict]:
+    db.init_schema()
+    results = []
+    for n in sizes:
+        frames = _make_frames(n)
+        # fresh insert then overwrite, both through the bulk path
+        _clear()
+        t_insert = _timed(lambda: _bulk(frames))
+        t_update = _timed(lambda: _bulk(frames))
+        res = {
+            "rows": n,
+            "bulk_insert_rows_per_s": n / t_insert,
+            "bulk_update_rows_per_s": n / t_update,
+            "legacy_rows_per_s": None,
+        }
+        if n <= legacy_max:
+            rows = []
+            for sym, df in frames:
+                rows += db.price_rows_from_columns(sym, "US", df.index.date, {k: df[k].tolist() for k in db.PRICE_FIELDS})
+            t_legacy = _timed(lambda: _legacy_upsert(rows))
+            res["legacy_rows_per_s"] = n / t_legacy
+        _clear()
+        results.append(res)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="1000,100000,1000000")
+    ap.add_argument("--legacy-max", type=int, default=100_000, help="skip the legacy loop above this size")
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    print(f"database: {db.DATABASE_URL}")
+    print(f"{'rows':>10} {'bulk insert/s':>15} {'bulk update/s':>15} {'legacy/s':>12}")
+    for r in run(sizes, args.legacy_max):
+        legacy = f"{r['legacy_rows_per_s']:>12,.0f}" if r['legacy_rows_per_s'] else f"{'-':>12}"
+        print(f"{r['rows']:>10,} {r['bulk_insert_rows_per_s']:>15,.0f} {r['bulk_update_rows_per_s']:>15,.0f} {legacy}")
+
+
+if __name__ == "__main__":
+    main()
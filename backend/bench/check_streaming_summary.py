@@ -0,0 +1,76 @@
+"""Property check: incremental window summaries equal ``StockAnalysisSummary.from_dataframe``.
+
+Generates random price windows, replaces the last bar repeatedly (as intraday
+refreshes do), occasionally appends a new day or revises an earlier bar (close or
+volume, first bar included), and compares every ``window_summary`` result with the
+batch calculation. The repository has no test suite; run this after touching
+``analytics/streaming.py``.
+
+Run from the repository root:
+    python -m backend.bench.check_streaming_summary [--cases 500] [--seed 0]
+"""
+import argparse
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ..analytics.streaming import window_summary
+from ..schemas.stocks import StockAnalysisSummary
+
+REL_TOL = 1e-9
+
+
+def _close(a: float, b: float) -> bool:
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=REL_TOL, abs_tol=1e-9)
+
+
+def run(cases: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    failures = []
+    for case in range(cases):
+        n = int(rng.integers(1, 400))
+        days = int(rng.integers(1, n + 1))
+        idx = pd.bdate_range(end="2024-06-28", periods=n)
+        df = pd.DataFrame({
+            "close": 100 * np.exp(rng.standard_normal(n).cumsum() * 0.03),
+            "volume": rng.integers(0, 10**7, n).astype(float),
+        }, index=idx)
+        for step in range(int(rng.integers(1, 20))):
+            roll = rng.random()
+            if roll < 0.1:  # a new trading day starts
+                nxt = df.index[-1] + pd.offsets.BDay()
+                df.loc[nxt] = [df['close'].iloc[-1], 0.0]
+            elif roll < 0.2 and days > 1:  # correction of an earlier bar inside the window
+                row = len(df) - days + int(rng.integers(0, days - 1))
+                col = int(rng.integers(0, 2))
+                df.iloc[row, col] = df.iloc[row, col] * 1.01 + (0.0 if col == 0 else 1.0)
+            else:  # intraday refresh of the last bar
+                df.iloc[-1, 0] = df['close'].iloc[-1] * float(np.exp(rng.standard_normal() * 0.01))
+                df.iloc[-1, 1] += float(rng.integers(0, 10**5))
+            window = df.tail(days)
+            got = window_summary(f"S{case}", "US", days, window).model_dump()
+            want = StockAnalysisSummary.from_dataframe(window).model_dump()
+            for k in want:
+                if not _close(float(got[k]), float(want[k])):
+                    failures.append(f"case {case} step {step} {k}: {got[k]!r} != {want[k]!r}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cases", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    failures = run(args.cases, args.seed)
+    for f in failures[:20]:
+        print(f)
+    print(f"{args.cases} cases, {len(failures)} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
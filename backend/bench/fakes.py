@@ -0,0 +1,167 @@
+"""Deterministic local stand-ins for the upstreams, with injectable latency.
+
+``install(latency)`` replaces ``yfinance.download`` / ``yfinance.Ticker`` and points
+the shared ``http_client`` at an ``httpx.MockTransport`` that answers the Yahoo
+screener, the Yahoo RSS feed and Ollama's ``/api/chat`` / ``/api/generate``.
+The same symbol always yields the same data, so runs are comparable.
+"""
+import asyncio
+import json
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import numpy as np
+import pandas as pd
+
+@dataclass
+class Latency:
+    """Injected upstream latency in seconds (0 = answer immediately)."""
+    yfinance: float = 0.0
+    screener: float = 0.0
+    rss: float = 0.0
+    ollama: float = 0.0
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(map(str, parts)).encode())
+
+def _ohlcv(symbol: str, index: pd.DatetimeIndex) -> pd.DataFrame:
+    """Prices are a function of (symbol, day) only, so overlapping ranges agree."""
+    base = 20 + _seed(symbol) % 480
+    days = index.values.astype('datetime64[D]').astype(np.int64)
+    noise = ((days * 2654435761 + _seed(symbol)) % 1000) / 1000 - 0.5
+    close = base * (1 + 0.2 * np.sin(days / 17.0) + 0.02 * noise)
+    return pd.DataFrame({
+        'Open': close * 0.995, 'High': close * 1.01, 'Low': close * 0.99,
+        'Close': close, 'Adj Close': close,
+        'Volume': 1_000_000 + (days % 97) * 10_000,
+    }, index=index.rename('Date'))
+
+class FakeYFinance:
+    def __init__(self, latency: Latency, counters: dict):
+        self.latency = latency
+        self.counters = counters
+
+    def _wait(self):
+        self.counters['yfinance'] = self.counters.get('yfinance', 0) + 1
+        if self.latency.yfinance:
+            time.sleep(self.latency.yfinance)
+
+    def download(self, tickers, start=None, end=None, group_by='column', **kwargs):
+        self._wait()
+        index = pd.bdate_range(start=start, end=pd.Timestamp(end) - pd.Timedelta(days=1))
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        frames = {t: _ohlcv(t, index) for t in tickers}
+        if len(frames) == 1 and group_by != 'ticker':
+            return next(iter(frames.values()))
+        return pd.concat(frames, axis=1)
+
+    def Ticker(self, symbol: str):
+        return FakeTicker(symbol, self)
+
+class FakeTicker:
+    def __init__(self, symbol: str, yf: FakeYFinance):
+        self.ticker = symbol
+        self._yf = yf
+
+    @property
+    def fast_info(self):
+        self._yf._wait()
+        last = _ohlcv(self.ticker, pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=1)).iloc[-1]
+        return {'last_price': float(last['Close']), 'open': float(last['Open']), 'day_high': float(last['High']),
+                'day_low': float(last['Low']), 'last_volume': int(last['Volume'])}
+
+    @property
+    def info(self):
+        self._yf._wait()
+        return {'shortName': f"{self.ticker} Holdings", 'longName': f"{self.ticker} Holdings Inc."}
+
+    @property
+    def news(self):
+        self._yf._wait()
+        now = int(time.time())
+        return [{'title': f"{self.ticker} headline {i}", 'providerPublishTime': now - i * 3600} for i in range(12)]
+
+    def history(self, period="1d", interval="1m", **kwargs):
+        self._yf._wait()
+        return _ohlcv(self.ticker, pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=1))
+
+    def get_earnings_dates(self, limit=12):
+        self._yf._wait()
+        # quarterly dates around today, offset per symbol
+        anchor = pd.Timestamp.today(tz='America/New_York').normalize() + pd.Timedelta(days=_seed(self.ticker) % 45)
+        idx = pd.DatetimeIndex([anchor - pd.DateOffset(months=3 * i) for i in range(limit)], name='Earnings Date')
+        eps = np.round(np.linspace(1.0, 2.0, limit), 2)
+        return pd.DataFrame({'EPS Estimate': eps, 'Reported EPS': eps * 1.05, 'Surprise(%)': 5.0}, index=idx)
+
+    calendar = None
+
+def _screener_quotes(count: int, seed: int) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(count):
+        price = float(rng.uniform(5, 500))
+        chg = float(rng.normal(0, price * 0.03))
+        out.append({'symbol': f"MV{i:02d}", 'shortName': f"Mover {i}", 'regularMarketPrice': price,
+                    'regularMarketChange': chg, 'regularMarketPreviousClose': price - chg,
+                    'regularMarketVolume': int(rng.integers(1e5, 1e8)), 'marketCap': int(rng.integers(1e8, 1e12)),
+                    'currency': 'USD'})
+    return out
+
+def _rss(symbol: str) -> str:
+    # changes once an hour, like a real feed between stories
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    items = "".join(
+        f"<item><title>{symbol} feed story {i}</title><pubDate>{format_datetime(now - timedelta(hours=i))}</pubDate></item>"
+        for i in range(15))
+    return f"<?xml version='1.0'?><rss version='2.0'><channel><title>{symbol}</title>{items}</channel></rss>"
+
+ANSWER = "<think>weighing the numbers</think>Final Answer: The trend is moderately positive with contained drawdowns."
+
+def make_handler(latency: Latency, counters: dict):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host, path = request.url.host, request.url.path
+        if 'screener' in path:
+            counters['screener'] = counters.get('screener', 0) + 1
+            await asyncio.sleep(latency.screener)
+            count = int(request.url.params.get('count', 25))
+            quotes = _screener_quotes(count, _seed(request.url.params.get('scrIds'), request.url.params.get('region')))
+            return httpx.Response(200, json={'finance': {'result': [{'quotes': quotes}]}})
+        if host.startswith('feeds.finance.yahoo.com'):
+            counters['rss'] = counters.get('rss', 0) + 1
+            await asyncio.sleep(latency.rss)
+            body = _rss(request.url.params.get('s', ''))
+            etag = f'"{_seed(body):08x}"'
+            if request.headers.get('If-None-Match') == etag:
+                return httpx.Response(304, headers={'ETag': etag})
+            return httpx.Response(200, text=body, headers={'ETag': etag})
+        if path.endswith('/api/chat') or path.endswith('/api/generate'):
+            counters['ollama'] = counters.get('ollama', 0) + 1
+            await asyncio.sleep(latency.ollama)
+            body = json.loads(request.content or b'{}')
+            if path.endswith('/api/generate'):
+                return httpx.Response(200, json={'response': ANSWER, 'done': True})
+            if body.get('stream'):
+                words = ANSWER.split(' ')
+                lines = [json.dumps({'message': {'content': w + ' '}, 'done': False}) for w in words]
+                lines.append(json.dumps({'message': {'content': ''}, 'done': True}))
+                return httpx.Response(200, text="\n".join(lines))
+            return httpx.Response(200, json={'message': {'role': 'assistant', 'content': ANSWER}, 'done': True})
+        return httpx.Response(404)
+    return handler
+
+def install(latency: Latency | None = None) -> dict:
+    """Patch yfinance and the shared HTTP client; returns upstream call counters."""
+    import yfinance
+    from .. import http_client
+    latency = latency or Latency()
+    counters: dict = {}
+    fake = FakeYFinance(latency, counters)
+    yfinance.download = fake.download
+    yfinance.Ticker = fake.Ticker
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(make_handler(latency, counters)))
+    return counters
@@ -0,0 +1,119 @@
+"""Columnar / binary encodings and content-encoding negotiation for price frames.
+
+``columnar`` JSON holds one array per column instead of one object per row, so
+building it needs no per-row dicts or Pydantic models. ``arrow`` (Arrow IPC
+stream, needs ``pyarrow``) and ``msgpack`` (needs ``msgpack``) are optional
+binary variants of the same payload. Bodies above ``COMPRESS_MIN_BYTES`` are
+brotli- or gzip-compressed according to the client's ``Accept-Encoding``.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+FORMATS = ("rows", "columnar", "arrow", "msgpack")
+MEDIA_TYPES = {
+    "columnar": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "msgpack": "application/msgpack",
+}
+# Arrow schema metadata key holding the non-tabular fields (symbol, summary, ...)
+ARROW_META_KEY = b"mcpilot"
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+def _column_list(values: np.ndarray) -> list:
+    """Column as a flat list; NaN becomes null (JSON has no NaN)."""
+    if values.dtype.kind == 'f':
+        mask = np.isnan(values)
+        if mask.any():
+            return np.where(mask, None, values).tolist()
+    return values.tolist()
+
+def frame_columns(df: pd.DataFrame) -> dict[str, list]:
+    """``{'date': [...], <column>: [...]}`` straight from the frame's arrays."""
+    cols = {'date': df.index.strftime('%Y-%m-%d').tolist()}
+    for name in df.columns:
+        if name != 'date':  # the index wins, as in the row format
+            cols[str(name)] = _column_list(df[name].to_numpy())
+    return cols
+
+def _arrow_body(df: pd.DataFrame, meta: dict) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise HTTPException(status_code=406, detail="format=arrow requires pyarrow on the server") from e
+    arrays = {'date': pa.array(df.index.values.astype('datetime64[D]'))}
+    for name in df.columns:
+        if name != 'date':
+            arrays[str(name)] = pa.array(df[name].to_numpy(), from_pandas=True)
+    table = pa.table(arrays)
+    table = table.replace_schema_metadata({ARROW_META_KEY: json.dumps(meta).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def encode_frame(fmt: str, df: pd.DataFrame, meta: dict) -> bytes:
+    """Serialize ``df`` plus the scalar fields in ``meta`` as ``fmt`` (not ``rows``)."""
+    if fmt == "arrow":
+        return _arrow_body(df, meta)
+    payload = {**meta, "format": "columnar", "columns": frame_columns(df)}
+    if fmt == "msgpack":
+        try:
+            import msgpack
+        except ImportError as e:
+            raise HTTPException(status_code=406, detail="format=msgpack requires msgpack on the server") from e
+        return msgpack.packb(payload)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Pick ``br`` (if brotli is installed) or ``gzip`` from an Accept-Encoding header."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+def encoded_response(body: bytes, fmt: str, accept_encoding: str | None) -> Response:
+    """Response for an encoded body, compressed when the client accepts it and it is worth it."""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
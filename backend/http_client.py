@@ -0,0 +1,101 @@
+"""Shared application-lifetime ``httpx.AsyncClient`` for upstream HTTP calls.
+
+All outbound HTTP (Yahoo screener/RSS, Ollama) goes through one pooled client so
+connections are kept alive between requests. ``request`` additionally caps the
+number of in-flight requests per host, so a slow upstream (e.g. a local model)
+cannot monopolise the pool.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+USER_AGENT = "stock-mcpilot/1.0"
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+
+_client: httpx.AsyncClient | None = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=10.0,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+        )
+    return _client
+
+async def aclose_client():
+    """Close the shared client (called from the app lifespan on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _host_limits.clear()
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    sem = _host_limits.get(host)
+    if sem is None:
+        sem = _host_limits[host] = asyncio.Semaphore(MAX_PER_HOST)
+    return sem
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Issue a request on the shared client, bounded by the per-host limit."""
+    async with _host_limit(url):
+        return await get_client().request(method, url, **kwargs)
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs):
+    """Streaming variant of ``request``; the host slot is held until the body is consumed."""
+    async with _host_limit(url):
+        async with get_client().stream(method, url, **kwargs) as resp:
+            yield resp
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+async def hedged_get(urls, accept=None, hedge_delay: float = 0.0, **kwargs) -> httpx.Response | None:
+    """GET equivalent ``urls`` (e.g. mirror hosts) concurrently; the first accepted response wins.
+
+    Request ``i`` starts ``i * hedge_delay`` seconds after the first. ``accept(resp)``
+    defaults to ``status_code == 200``. Requests still in flight once a winner is
+    found are cancelled. Returns None when no response is accepted; if every
+    request raised, the last error is re-raised.
+    """
+    accept = accept or (lambda r: r.status_code == 200)
+
+    async def _one(i: int, url: str):
+        if i and hedge_delay > 0:
+            await asyncio.sleep(i * hedge_delay)
+        return await get(url, **kwargs)
+
+    pending = {asyncio.ensure_future(_one(i, u)) for i, u in enumerate(urls)}
+    error = None
+    responded = False
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                resp = task.result()
+                responded = True
+                if accept(resp):
+                    return resp
+    finally:
+        for task in pending:
+            task.cancel()
+    if error is not None and not responded:
+        raise error
+    return None
@@ -0,0 +1,24 @@
+"""Deferred imports for heavy dependencies (pandas, numpy, yfinance).
+
+``pd = lazy_import("pandas")`` binds a stand-in module whose first attribute access
+imports the real one, so importing ``backend.main`` does not pay for them; the
+first request that needs a DataFrame does. Modules using it add
+``from __future__ import annotations`` so ``pd.DataFrame`` hints are not evaluated
+at definition time.
+"""
+import importlib
+import sys
+import types
+
+class _LazyModule(types.ModuleType):
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__name__ in sys.modules else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+def lazy_import(name: str) -> types.ModuleType:
+    """The module if it is already imported, else a stand-in that imports it on first use."""
+    return sys.modules.get(name) or _LazyModule(name)
@@ -0,0 +1,129 @@
+"""Live quote fan-out: one upstream poller per subscribed symbol, shared by all viewers.
+
+``hub.subscribe`` registers a ``Subscriber`` (one per SSE / WebSocket client) for
+(symbol, market) keys. The first subscriber of a key starts its poller; the last
+one leaving cancels it. Pollers read ``get_live_quote`` (so REST requests share the
+same quote cache) every ``LIVE_POLL_SECONDS`` while the market is open and only
+check ``_session_status`` every ``LIVE_IDLE_SECONDS`` otherwise. Subscribers get
+the full snapshot on subscribe and only the changed fields afterwards.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from .storage.cache import _session_status, get_live_quote
+
+log = logging.getLogger(__name__)
+
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "5"))
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "60"))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+
+QUOTE_FIELDS = ('status', 'open', 'high', 'low', 'close', 'volume')
+
+class Subscriber:
+    """Per-client message queue. A client that falls behind is resynced with full snapshots."""
+
+    def __init__(self, maxsize: int = LIVE_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.keys: set = set()
+
+    def push(self, msg: dict, hub: "QuoteHub"):
+        try:
+            self.queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            # deltas were about to be lost: replace the backlog with current snapshots
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            for key in self.keys:
+                snap = hub.snapshot(key)
+                if snap is not None:
+                    self.queue.put_nowait(snap)
+
+class QuoteHub:
+    def __init__(self, fetch=get_live_quote, session_status=_session_status):
+        self._fetch = fetch
+        self._status = session_status
+        self._subs: dict[tuple, set[Subscriber]] = {}
+        self._pollers: dict[tuple, asyncio.Task] = {}
+        self._last: dict[tuple, dict] = {}
+
+    def snapshot(self, key: tuple) -> dict | None:
+        last = self._last.get(key)
+        if last is None:
+            return None
+        return {'symbol': key[0], 'market': key[1], **last}
+
+    def subscribe(self, sub: Subscriber, symbol: str, market: str):
+        key = (symbol, market)
+        if key in sub.keys:
+            return
+        sub.keys.add(key)
+        self._subs.setdefault(key, set()).add(sub)
+        snap = self.snapshot(key)
+        if snap is not None:
+            sub.push(snap, self)
+        if key not in self._pollers:
+            self._pollers[key] = asyncio.create_task(self._poll(key), name=f"quote-poller-{symbol}-{market}")
+
+    def unsubscribe(self, sub: Subscriber, symbol: str, market: str):
+        key = (symbol, market)
+        sub.keys.discard(key)
+        subs = self._subs.get(key)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            # nobody watching: stop polling upstream
+            del self._subs[key]
+            self._last.pop(key, None)
+            task = self._pollers.pop(key, None)
+            if task is not None:
+                task.cancel()
+
+    def unsubscribe_all(self, sub: Subscriber):
+        for symbol, market in list(sub.keys):
+            self.unsubscribe(sub, symbol, market)
+
+    def active_symbols(self) -> list[tuple]:
+        return list(self._pollers)
+
+    def _publish(self, key: tuple, current: dict):
+        last = self._last.get(key, {})
+        delta = {k: v for k, v in current.items() if last.get(k) != v}
+        if not delta:
+            return
+        self._last[key] = {**last, **current}
+        msg = {'symbol': key[0], 'market': key[1], **delta, 'ts': datetime.now(timezone.utc).isoformat()}
+        self._last[key]['ts'] = msg['ts']
+        for sub in list(self._subs.get(key, ())):
+            sub.push(msg, self)
+
+    async def _poll(self, key: tuple):
+        symbol, market = key
+        while key in self._subs:
+            status = self._status(market)[0]
+            current = {'status': status}
+            # outside the session one quote (the last price) is enough
+            if status == 'open' or key not in self._last:
+                try:
+                    quote = await asyncio.to_thread(self._fetch, symbol, market)
+                except Exception:
+                    log.warning("live quote %s/%s failed", symbol, market, exc_info=True)
+                    quote = None
+                if quote:
+                    current.update({k: quote[k] for k in QUOTE_FIELDS if k in quote})
+            self._publish(key, current)
+            await asyncio.sleep(LIVE_POLL_SECONDS if status == 'open' else LIVE_IDLE_SECONDS)
+
+    async def aclose(self):
+        tasks = list(self._pollers.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pollers.clear()
+        self._subs.clear()
+        self._last.clear()
+
+hub = QuoteHub()
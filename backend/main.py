@@ -1,8 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import stocks, analysis, settings
+from . import http_client, live, metrics, prefetch, tracing
+from .storage import db
 
-app = FastAPI(title="Stock MCPilot API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db.init_schema()
+    prefetch_task = prefetch.start()  # after-close cache warming (PREFETCH_WATCHLIST)
+    yield
+    await prefetch.stop(prefetch_task)
+    await live.hub.aclose()
+    await http_client.aclose_client()
+
+app = FastAPI(title="Stock MCPilot API", version="0.1.0", lifespan=lifespan)
 
 origins = [
     "http://localhost",
@@ -16,11 +29,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(tracing.TimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(stocks.router, prefix="/stocks", tags=["stocks"])
 app.include_router(analysis.router, prefix="/analysis", tags=["analysis"])
 app.include_router(settings.router, prefix="/settings", tags=["settings"])
@@ -0,0 +1,160 @@
+"""Minimal in-process Prometheus metrics (counters, histograms, scrape-time collectors).
+
+Dependency free and cheap enough to leave on: an update is one lock plus a dict
+lookup (a bisect more for histograms). ``render()`` produces the Prometheus text
+exposition format served at ``/metrics``. ``MetricsMiddleware`` times every HTTP
+request by route template.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+_registry: list = []
+_collectors: list = []  # scrape-time callables, see register_collector
+
+def _fmt_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        out += [f"{self.name}{_fmt_labels(self.labelnames, k)} {_num(v)}" for k, v in sorted(items)]
+        return out
+
+# seconds; covers SQLite reads (sub-ms) up to slow model generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for labels, s in sorted(items):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), s[:-2]):
+                cumulative += n
+                le = 'le="' + _num(bound) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {_num(s[-2])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {s[-1]}")
+        return out
+
+def register_collector(fn):
+    """``fn()`` is called at scrape time and returns ``[(name, type, help, labelnames, [(labels, value)])]``."""
+    _collectors.append(fn)
+    return fn
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    for fn in _collectors:
+        try:
+            families = fn()
+        except Exception:
+            continue
+        for name, mtype, help, labelnames, samples in families:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {mtype}"]
+            lines += [f"{name}{_fmt_labels(labelnames, labels)} {_num(v)}" for labels, v in samples]
+    return "\n".join(lines) + "\n"
+
+# ---------------- metric families -----------------
+
+UPSTREAM_SECONDS = Histogram("mcpilot_upstream_request_seconds",
+                             "Latency of calls to external data sources.", ("upstream", "outcome"))
+UPSTREAM_REJECTED = Counter("mcpilot_upstream_rejected_total",
+                            "Calls not sent because the upstream's circuit was open.", ("upstream",))
+CACHE_REQUESTS = Counter("mcpilot_cache_requests_total",
+                         "Cache lookups by cache and result (hit, miss, stale, revalidated).", ("cache", "result"))
+DB_ROWS = Counter("mcpilot_db_rows_total", "Rows read from / written to storage.", ("table", "op"))
+LLM_TOKENS = Counter("mcpilot_llm_tokens_total", "Tokens generated by the LLM provider.", ("provider", "model"))
+LLM_SECONDS = Histogram("mcpilot_llm_generation_seconds", "Wall time of LLM generations.", ("provider", "outcome"))
+HTTP_SECONDS = Histogram("mcpilot_http_request_seconds", "HTTP request latency by route template.",
+                         ("method", "route", "status"))
+
+def _route_template(scope) -> str:
+    """Matched route template, e.g. ``/stocks/{symbol}`` (not the raw path: bounded cardinality)."""
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    # some FastAPI versions report routes of an included router without its prefix;
+    # path params never contain '/', so the missing leading segments come from the raw path
+    path = scope.get("path", "")
+    missing = path.rstrip("/").count("/") - template.rstrip("/").count("/")
+    if missing > 0:
+        template = "/".join(path.split("/")[:missing + 1]) + template
+    return template
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no body buffering, safe for SSE / WebSocket)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = {"code": 500}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_SECONDS.observe(time.perf_counter() - t0, scope["method"], _route_template(scope), str(status["code"]))
@@ -0,0 +1,118 @@
+"""After-close prefetch of daily bars, news and company names for a watchlist.
+
+A background task started from the app lifespan sleeps until
+``PREFETCH_DELAY_MINUTES`` after each watched market's close, then warms the
+caches: one batched download for the daily bars (``get_price_data_many``), one
+batched company-name resolution (``storage.symbols``), and news per symbol with at
+most ``PREFETCH_CONCURRENCY`` in flight and a random start delay of up to
+``PREFETCH_JITTER_SECONDS`` each. Nothing runs
+when ``PREFETCH_WATCHLIST`` is empty.
+
+``PREFETCH_WATCHLIST`` is comma separated; entries are ``SYMBOL`` (US) or
+``MARKET:SYMBOL``, e.g. ``AAPL,MSFT,HK:0700,CN:600519``.
+"""
+import asyncio
+import logging
+import os
+import random
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from .storage.cache import _MARKET_CLOSE, _MARKET_TZ, _session_status, get_price_data_many, refresh_news
+from .storage.symbols import resolve_many
+
+log = logging.getLogger(__name__)
+
+PREFETCH_DELAY = timedelta(minutes=float(os.getenv("PREFETCH_DELAY_MINUTES", "30")))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+PREFETCH_JITTER_SECONDS = float(os.getenv("PREFETCH_JITTER_SECONDS", "20"))
+# calendar days of history warmed; the /stocks/{symbol} default (60 rows) reads 120
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "120"))
+
+def parse_watchlist(spec: str) -> dict[str, list[str]]:
+    """``"AAPL,HK:0700"`` -> ``{'US': ['AAPL'], 'HK': ['0700']}`` (order kept, duplicates dropped)."""
+    out: dict[str, list[str]] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        market, _, symbol = item.rpartition(":")
+        market = (market or "US").upper()
+        symbol = symbol.upper()
+        if market not in _MARKET_TZ:
+            log.warning("prefetch: unknown market in watchlist entry %r", item)
+            continue
+        if symbol not in out.setdefault(market, []):
+            out[market].append(symbol)
+    return out
+
+WATCHLIST = parse_watchlist(os.getenv("PREFETCH_WATCHLIST", ""))
+
+def next_run(market: str, now: datetime | None = None) -> datetime:
+    """Next weekday close + PREFETCH_DELAY for ``market``, as an aware datetime in its zone."""
+    tz = ZoneInfo(_MARKET_TZ[market])
+    now = now.astimezone(tz) if now is not None else datetime.now(tz)
+    day = now.date()
+    while True:
+        if day.weekday() < 5:
+            run_at = datetime.combine(day, _MARKET_CLOSE[market], tzinfo=tz) + PREFETCH_DELAY
+            if run_at > now:
+                return run_at
+        day += timedelta(days=1)
+
+async def _jittered(sem: asyncio.Semaphore, fn, *args):
+    await asyncio.sleep(random.uniform(0, PREFETCH_JITTER_SECONDS))
+    async with sem:
+        try:
+            return await fn(*args)
+        except Exception:
+            log.warning("prefetch: %s%r failed", getattr(fn, "__name__", fn), args, exc_info=True)
+
+async def prefetch_market(market: str, symbols: list[str]):
+    """Warm bars, news and names for ``symbols`` of one market."""
+    if not symbols:
+        return
+    end = date.today()
+    pairs = [(s, market) for s in symbols]
+    try:
+        # one multi-ticker download for every gap
+        await asyncio.to_thread(get_price_data_many, pairs, end - timedelta(days=PREFETCH_DAYS), end)
+    except Exception:
+        log.warning("prefetch: daily bars for %s failed", market, exc_info=True)
+    try:
+        # names of all symbols in one pass (stored, so usually no network at all)
+        await asyncio.to_thread(resolve_many, pairs)
+    except Exception:
+        log.warning("prefetch: names for %s failed", market, exc_info=True)
+    sem = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+    await asyncio.gather(*(_jittered(sem, refresh_news, s, market) for s in symbols))
+    log.info("prefetch: warmed %d %s symbols", len(symbols), market)
+
+async def run_scheduler(watchlist: dict[str, list[str]] | None = None):
+    """Loop forever, prefetching each market once per trading day after its close."""
+    watchlist = WATCHLIST if watchlist is None else watchlist
+    due = {m: next_run(m) for m in watchlist}
+    while due:
+        market = min(due, key=lambda m: due[m])
+        delay = (due[market] - datetime.now(due[market].tzinfo)).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # rough holiday guard: only run if the session really is over
+        if _session_status(market)[0] == 'closed':
+            await prefetch_market(market, watchlist[market])
+        due[market] = next_run(market)
+
+def start() -> asyncio.Task | None:
+    """Start the scheduler task (None when no watchlist is configured)."""
+    if not WATCHLIST:
+        return None
+    return asyncio.create_task(run_scheduler(), name="prefetch-scheduler")
+
+async def stop(task: asyncio.Task | None):
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
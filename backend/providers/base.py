@@ -1,9 +1,13 @@
 import os
+import re
 from abc import ABC, abstractmethod
 import json
-from typing import Optional
+import time
+from typing import AsyncIterator, Optional
 
-import httpx
+from .. import http_client
+from ..resilience import OLLAMA, CircuitOpenError, UpstreamError, http_failure
+from ..metrics import LLM_SECONDS, LLM_TOKENS, UPSTREAM_SECONDS
 
 settings_state = {
     "mode": os.getenv("LLM_MODE", "local"),
@@ -12,12 +16,116 @@ settings_state = {
     "language": os.getenv("APP_LANGUAGE", "en"),  # 'en' or 'zh'
 }
 
+SYSTEM_PROMPT = "你是资深量化与基本面结合的股票分析助手, 输出要结构化列出: 1) 概览 2) 短期动量 3) 波动与风险 4) 机会与关注点 5) 免责声明。避免过度乐观措辞。"
+
 class BaseProvider(ABC):
+    # Set when the last generate() returned placeholder text instead of a model answer
+    # (such output must not be cached).
+    used_fallback: bool = False
+    # Set when the last stream() delivered the whole answer (e.g. Ollama's final `done`
+    # message arrived); a partial stream must not be cached either.
+    completed: bool = False
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return None
+
     @abstractmethod
-    def generate(self, prompt: str) -> str:  # pragma: no cover - simple stub
+    async def generate(self, prompt: str) -> str:  # pragma: no cover - simple stub
         ...
 
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the answer in chunks; providers without streaming emit it in one piece."""
+        self.completed = False
+        text = await self.generate(prompt)
+        self.completed = True
+        yield text
+
+class ThinkFilter:
+    """Incremental version of ``LocalProvider._postprocess`` for streamed text.
+
+    Drops ``<think>``/``<thinking>`` blocks and a leading ``Final Answer:`` even when
+    tags are split across chunks. Only text that may still turn into a tag is held back.
+    """
+    _OPEN = re.compile(r"<(think|thinking)>", re.IGNORECASE)
+    _PREFIX = re.compile(r"^\s*Final Answer:\s*", re.IGNORECASE)
+    _MAX_TAG = len("</thinking>")
+
+    def __init__(self):
+        self._buf = ""
+        self._close: Optional[str] = None  # closing tag while inside a thinking block
+        self._block = ""  # text of the open thinking block (re-emitted if never closed)
+        self._started = False  # leading whitespace / 'Final Answer:' already handled
+        self._head_buf = ""
+        self._ws = ""  # trailing whitespace held back so the final answer is stripped
+
+    @staticmethod
+    def _partial_tag_start(text: str) -> int:
+        """Index of a trailing '<...' that could still become a tag, else len(text)."""
+        i = text.rfind("<", max(0, len(text) - ThinkFilter._MAX_TAG))
+        return i if i != -1 and ">" not in text[i:] else len(text)
+
+    def _drain(self, final: bool) -> str:
+        out = []
+        while self._buf:
+            if self._close is not None:
+                j = self._buf.lower().find(self._close)
+                if j == -1:
+                    keep = 0 if final else min(len(self._buf), len(self._close) - 1)
+                    self._block += self._buf[:len(self._buf) - keep]
+                    self._buf = self._buf[len(self._buf) - keep:]
+                    break
+                self._buf = self._buf[j + len(self._close):]
+                self._close = None
+                self._block = ""
+                continue
+            m = self._OPEN.search(self._buf)
+            if m:
+                out.append(self._buf[:m.start()])
+                self._close = f"</{m.group(1).lower()}>"
+                self._block = m.group(0)
+                self._buf = self._buf[m.end():]
+                continue
+            cut = len(self._buf) if final else self._partial_tag_start(self._buf)
+            out.append(self._buf[:cut])
+            self._buf = self._buf[cut:]
+            break
+        if final and self._close is not None:
+            # unterminated block: the regex version leaves it in place
+            out.append(self._block)
+            self._close = None
+            self._block = ""
+        return "".join(out)
+
+    def _head(self, text: str, final: bool) -> str:
+        if self._started:
+            return text
+        self._head_buf += text
+        stripped = self._head_buf.lstrip().lower()
+        if not final and ("final answer:".startswith(stripped)
+                          or (stripped.startswith("final answer:") and not stripped[13:].strip())):
+            return ""  # may still be (or be followed by) the 'Final Answer:' prefix
+        self._started = True
+        return self._PREFIX.sub("", self._head_buf, count=1).lstrip()
+
+    def _tail(self, text: str) -> str:
+        text = self._ws + text
+        body = text.rstrip()
+        self._ws = text[len(body):]
+        return body
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        return self._tail(self._head(self._drain(final=False), final=False))
+
+    def flush(self) -> str:
+        return self._tail(self._head(self._drain(final=True), final=True))
+
 class LocalProvider(BaseProvider):
+    @property
+    def model_name(self) -> Optional[str]:
+        return settings_state.get('local_model') or 'llama3'
+
     def _ollama_endpoint(self) -> str:
         return os.getenv("OLLAMA_ENDPOINT", "http://localhost:11434")
 
@@ -34,66 +142,145 @@ class LocalProvider(BaseProvider):
         text = re.sub(r"^\s*Final Answer:\s*", "", text, flags=re.IGNORECASE)
         return text.strip()
 
-    def _try_ollama(self, prompt: str) -> Optional[str]:
+    @staticmethod
+    def _count_tokens(model: str, data: dict, text: str):
+        """Ollama reports ``eval_count`` (generated tokens); otherwise estimate by words."""
+        n = data.get('eval_count')
+        LLM_TOKENS.inc('local', model, amount=n if isinstance(n, int) else len(text.split()))
+
+    async def _try_ollama(self, prompt: str) -> Optional[str]:
         model = settings_state.get('local_model') or 'llama3'
         url = self._ollama_endpoint().rstrip('/') + '/api/chat'
         payload = {
             "model": model,
             "messages": [
-                {"role": "system", "content": "你是资深量化与基本面结合的股票分析助手, 输出要结构化列出: 1) 概览 2) 短期动量 3) 波动与风险 4) 机会与关注点 5) 免责声明。避免过度乐观措辞。"},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             "stream": False,
         }
         try:
-            # Increase timeout to support slower local models (e.g., deepseek-r1:8b)
-            with httpx.Client(timeout=120) as client:
-                resp = client.post(url, json=payload)
+            # adaptive timeout (up to 120 s for slower local models, e.g. deepseek-r1:8b)
+            resp = await OLLAMA.call(lambda timeout: http_client.post(url, json=payload, timeout=timeout), failure=http_failure)
             if resp.status_code != 200:
-                return self._try_ollama_generate(prompt, model)
+                return await self._try_ollama_generate(prompt, model)
             data = resp.json()
             # Ollama (non-stream) 返回包含 message/content
             message = data.get('message') or {}
             content = message.get('content')
             if content:
+                self._count_tokens(model, data, content)
                 return self._postprocess(content)
             # 某些版本可能直接有 'content'
             if 'content' in data and isinstance(data['content'], str):
                 return self._postprocess(data['content'])
             # If chat returns nothing, try generate endpoint
-            return self._try_ollama_generate(prompt, model)
+            return await self._try_ollama_generate(prompt, model)
+        except CircuitOpenError:
+            return None  # Ollama known to be down: placeholder right away
         except Exception:
-            return self._try_ollama_generate(prompt, model)
+            return await self._try_ollama_generate(prompt, model)
 
-    def _try_ollama_generate(self, prompt: str, model: Optional[str] = None) -> Optional[str]:
+    async def _try_ollama_generate(self, prompt: str, model: Optional[str] = None) -> Optional[str]:
         model = model or (settings_state.get('local_model') or 'llama3')
         url = self._ollama_endpoint().rstrip('/') + '/api/generate'
-        sys = "你是资深量化与基本面结合的股票分析助手, 输出要结构化列出: 1) 概览 2) 短期动量 3) 波动与风险 4) 机会与关注点 5) 免责声明。避免过度乐观措辞。"
-        full_prompt = f"{sys}\n\n用户输入:\n{prompt}"
+        full_prompt = f"{SYSTEM_PROMPT}\n\n用户输入:\n{prompt}"
         payload = {
             "model": model,
             "prompt": full_prompt,
             "stream": False,
         }
         try:
-            with httpx.Client(timeout=120) as client:
-                resp = client.post(url, json=payload)
+            resp = await OLLAMA.call(lambda timeout: http_client.post(url, json=payload, timeout=timeout), failure=http_failure)
             if resp.status_code != 200:
                 return None
             data = resp.json()
             # /api/generate returns { response: string, ... }
             content = data.get('response')
             if isinstance(content, str) and content.strip():
+                self._count_tokens(model, data, content)
                 return self._postprocess(content)
             return None
         except Exception:
             return None
 
-    def generate(self, prompt: str) -> str:
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Stream tokens from Ollama's chat API (``stream: true``, NDJSON lines).
+
+        Falls back to ``generate`` (non-streamed /api/generate, then placeholder) if the
+        chat stream fails before producing any text. A failure after that, including a
+        stream that ends without Ollama's ``done`` message, is raised: the text so far
+        is a truncated answer.
+        """
+        model = settings_state.get('local_model') or 'llama3'
+        url = self._ollama_endpoint().rstrip('/') + '/api/chat'
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "stream": True,
+        }
+        flt = ThinkFilter()
+        emitted = False
+        self.completed = False
+        # open circuit: skip the stream, generate() answers with the placeholder at once
+        if OLLAMA.allow():
+            t0 = time.perf_counter()
+            chunks, eval_count = 0, None
+            try:
+                async with http_client.stream("POST", url, json=payload, timeout=OLLAMA.timeout()) as resp:
+                    if http_failure(resp):
+                        raise UpstreamError(f"ollama: HTTP {resp.status_code}")
+                    if resp.status_code == 200:
+                        async for line in resp.aiter_lines():
+                            if not line.strip():
+                                continue
+                            data = json.loads(line)
+                            content = (data.get('message') or {}).get('content') or ''
+                            chunks += bool(content)  # Ollama streams about one token per chunk
+                            piece = flt.feed(content)
+                            if piece:
+                                emitted = True
+                                yield piece
+                            if data.get('done'):
+                                eval_count = data.get('eval_count')
+                                self.completed = True
+                                break
+                        else:
+                            raise UpstreamError("ollama: stream ended without done")
+                OLLAMA.record_success()
+                elapsed = time.perf_counter() - t0
+                UPSTREAM_SECONDS.observe(elapsed, OLLAMA.name, 'ok')
+                if chunks:
+                    LLM_TOKENS.inc('local', model, amount=eval_count if isinstance(eval_count, int) else chunks)
+                    LLM_SECONDS.observe(elapsed, 'local', 'ok')
+            except Exception:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - t0, OLLAMA.name, 'error')
+                OLLAMA.record_failure()
+                if emitted:
+                    raise
+            except BaseException:  # client went away mid-stream
+                OLLAMA.release()
+                raise
+        tail = flt.flush()
+        if tail:
+            emitted = True
+            yield tail
+        if not emitted:
+            text = await self.generate(prompt)
+            self.completed = True
+            yield text
+
+    async def generate(self, prompt: str) -> str:
         # 优先尝试本地 Ollama, 失败则回退占位文本
-        result = self._try_ollama(prompt)
+        t0 = time.perf_counter()
+        result = await self._try_ollama(prompt)
+        LLM_SECONDS.observe(time.perf_counter() - t0, 'local', 'ok' if result else 'fallback')
         if result:
             return result
+        self.used_fallback = True
         lang = settings_state.get('language', 'en')
         if lang == 'zh':
             return f"[LOCAL MODEL {settings_state.get('local_model')}] (Ollama 不可用或调用失败, 使用占位结果) 摘要分析: 输入长度 {len(prompt)} 字符。"
@@ -101,8 +288,9 @@ class LocalProvider(BaseProvider):
             return f"[LOCAL MODEL {settings_state.get('local_model')}] (Ollama unavailable, fallback placeholder). Prompt length {len(prompt)} chars."
 
 class CloudProvider(BaseProvider):
-    def generate(self, prompt: str) -> str:
+    async def generate(self, prompt: str) -> str:
         # TODO: 使用 LiteLLM / OpenAI 接口
+        self.used_fallback = True  # mock output until a real cloud call exists
         key = settings_state.get('api_key')
         lang = settings_state.get('language', 'en')
         if not key:
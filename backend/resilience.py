@@ -0,0 +1,212 @@
+"""Per-upstream circuit breakers, adaptive timeouts and retry budgets.
+
+Every external data source (yfinance, the Yahoo screener, the Yahoo RSS feed,
+Ollama) has one ``Upstream``:
+
+- circuit breaker: after ``failure_threshold`` consecutive failures the circuit
+  opens and calls fail immediately with ``CircuitOpenError`` for ``open_seconds``;
+  then one probe call is let through (half-open) and its outcome closes or
+  re-opens the circuit.
+- adaptive timeout: ``factor`` x the ``percentile`` of recent successful
+  latencies, clamped to [``min_timeout``, ``max_timeout``]. Until
+  ``min_samples`` latencies are known the old fixed timeout (``max_timeout``) applies.
+- retry budget: each first attempt earns ``retry_ratio`` tokens (capped), each
+  retry spends one, so retries never add more than that fraction of load.
+
+Callers catch the error and fall back to cached data or a placeholder as before;
+the difference is that a dead source now costs microseconds instead of a timeout.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from .metrics import UPSTREAM_REJECTED, UPSTREAM_SECONDS, register_collector
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+RETRY_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+class UpstreamError(Exception):
+    """A response the upstream returned but that counts as a failure (e.g. HTTP 5xx)."""
+
+def http_failure(resp) -> bool:
+    """Default failure test for httpx responses: 5xx and 429 mean the upstream is struggling."""
+    return resp is not None and (resp.status_code >= 500 or resp.status_code == 429)
+
+class Upstream:
+    def __init__(self, name: str, max_timeout: float, min_timeout: float = 1.0, *,
+                 percentile: float = 0.99, factor: float = 2.0, window: int = 200, min_samples: int = 20,
+                 failure_threshold: int = FAILURE_THRESHOLD, open_seconds: float = OPEN_SECONDS,
+                 retry_ratio: float = RETRY_RATIO, retry_cap: float = 10.0):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.percentile = percentile
+        self.factor = factor
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.retry_ratio = retry_ratio
+        self.retry_cap = retry_cap
+        self._latencies: deque = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._budget = retry_cap
+        self._lock = threading.Lock()
+
+    # -- circuit breaker -------------------------------------------------------------------
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.open_seconds:
+            return 'open'
+        return 'half_open'
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the single half-open probe slot)."""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self, latency: float | None = None):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """Give back the half-open probe slot without an outcome (call abandoned)."""
+        with self._lock:
+            self._probing = False
+
+    # -- adaptive timeout ------------------------------------------------------------------
+    def timeout(self) -> float:
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.max_timeout
+            ordered = sorted(self._latencies)
+        p = ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+        return min(self.max_timeout, max(self.min_timeout, p * self.factor))
+
+    # -- retry budget ----------------------------------------------------------------------
+    def _earn(self):
+        with self._lock:
+            self._budget = min(self.retry_cap, self._budget + self.retry_ratio)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._budget < 1.0:
+                return False
+            self._budget -= 1.0
+            return True
+
+    # -- calls -----------------------------------------------------------------------------
+    async def call(self, fn, *, retries: int = 0, failure=None):
+        """``await fn(timeout)`` through the breaker.
+
+        ``fn`` gets the current adaptive timeout (pass it on to httpx); the whole call is
+        also capped by it. ``failure(result)`` marks returned values as failures. Raises
+        ``CircuitOpenError``, the call's own error, ``asyncio.TimeoutError`` or ``UpstreamError``.
+        """
+        self._earn()
+        attempt = 0
+        while True:
+            if not self.allow():
+                UPSTREAM_REJECTED.inc(self.name)
+                raise CircuitOpenError(self.name)
+            timeout = self.timeout()
+            t0 = time.monotonic()
+            try:
+                result = await asyncio.wait_for(fn(timeout), timeout)
+                if failure is not None and failure(result):
+                    raise UpstreamError(f"{self.name}: bad response")
+            except asyncio.CancelledError:
+                # the caller gave up (e.g. a hedged loser): says nothing about the upstream
+                self.release()
+                raise
+            except Exception as e:
+                UPSTREAM_SECONDS.observe(time.monotonic() - t0, self.name,
+                                         'timeout' if isinstance(e, asyncio.TimeoutError) else 'error')
+                self.record_failure()
+                if attempt < retries and self._spend():
+                    attempt += 1
+                    continue
+                raise
+            elapsed = time.monotonic() - t0
+            UPSTREAM_SECONDS.observe(elapsed, self.name, 'ok')
+            self.record_success(elapsed)
+            return result
+
+    def call_sync(self, fn, *args, failure=None, **kwargs):
+        """Blocking variant for thread-bound clients (yfinance): breaker and latency only.
+
+        The call cannot be cut short from here: pass ``self.timeout()`` on to clients
+        that take a timeout. ``failure(result)`` marks returned values as failures
+        (``UpstreamError``); leave it out where an empty answer is legitimate, e.g.
+        yfinance's empty frame for a holiday or an unknown ticker.
+        """
+        self._earn()
+        if not self.allow():
+            UPSTREAM_REJECTED.inc(self.name)
+            raise CircuitOpenError(self.name)
+        t0 = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+            if failure is not None and failure(result):
+                raise UpstreamError(f"{self.name}: bad response")
+        except Exception:
+            UPSTREAM_SECONDS.observe(time.monotonic() - t0, self.name, 'error')
+            self.record_failure()
+            raise
+        elapsed = time.monotonic() - t0
+        UPSTREAM_SECONDS.observe(elapsed, self.name, 'ok')
+        self.record_success(elapsed)
+        return result
+
+    def snapshot(self) -> dict:
+        return {'name': self.name, 'state': self.state, 'timeout': round(self.timeout(), 3),
+                'samples': len(self._latencies), 'consecutive_failures': self._failures}
+
+YFINANCE = Upstream('yfinance', max_timeout=30.0, min_timeout=2.0)
+YAHOO_SCREENER = Upstream('yahoo_screener', max_timeout=8.0)
+YAHOO_RSS = Upstream('yahoo_rss', max_timeout=6.0)
+# model latency scales with prompt / answer length: keep a generous floor
+OLLAMA = Upstream('ollama', max_timeout=120.0, min_timeout=30.0, factor=3.0)
+
+UPSTREAMS = {u.name: u for u in (YFINANCE, YAHOO_SCREENER, YAHOO_RSS, OLLAMA)}
+
+@register_collector
+def _circuit_metrics():
+    ups = list(UPSTREAMS.values())
+    return [
+        ("mcpilot_upstream_circuit_open", "gauge", "1 while the upstream's circuit is open or half-open.",
+         ("upstream",), [((u.name,), int(u.state != 'closed')) for u in ups]),
+        ("mcpilot_upstream_timeout_seconds", "gauge", "Current adaptive timeout per upstream.",
+         ("upstream",), [((u.name,), u.timeout()) for u in ups]),
+    ]
@@ -1,13 +1,18 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from ..routers.stocks import get_stock_daily
+from ..schemas.stocks import MAX_DAYS
 from ..providers.base import get_provider
+from ..storage import llm_cache
 
 class AnalysisRequest(BaseModel):
     symbol: str
     market: str = "US"
     question: str | None = None
-    days: int = 60
+    days: int = Field(60, ge=1, le=MAX_DAYS)
     language: str | None = None  # 'en' or 'zh'
 
 class AnalysisResponse(BaseModel):
@@ -15,12 +20,15 @@ class AnalysisResponse(BaseModel):
     market: str
     summary: dict
     analysis: str
+    cached: bool = False  # served from the LLM response cache
 
 router = APIRouter()
 
-@router.post("/", response_model=AnalysisResponse)
-def analyze(req: AnalysisRequest):
-    daily = get_stock_daily(req.symbol, req.market, req.days)
+async def _prepare(req: AnalysisRequest):
+    """Load the daily summary and build the prompt -> (daily, summary_dict, provider, prompt, lang)."""
+    # price loading is blocking (yfinance / SQLite): keep it off the event loop
+    daily = await asyncio.to_thread(get_stock_daily, req.symbol, req.market, req.days, format="rows",
+                                    max_points=None, downsample="lttb", interval="1d", accept_encoding=None)
     provider = get_provider()
     lang = req.language or provider.__class__.__name__  # fallback later replaced
     # Determine language fallback from settings_state if not provided
@@ -38,8 +46,63 @@ def analyze(req: AnalysisRequest):
         if req.question:
             prompt += f"User question: {req.question}\n"
         prompt += "Provide a concise, structured English analysis: 1) Overview 2) Short-term Momentum 3) Volatility & Risk 4) Opportunities & Watchpoints 5) Conclusion & Disclaimer. Avoid overconfident language."
+    return daily, summary_dict, provider, prompt, lang
+
+def _cache_key(provider, lang: str, prompt: str) -> str:
+    return llm_cache.cache_key(provider.__class__.__name__, provider.model_name, lang, prompt)
+
+async def _cache_store(provider, lang: str, key: str, text: str):
+    if provider.used_fallback:
+        return  # never cache placeholder output
+    await asyncio.to_thread(llm_cache.store, key, provider.__class__.__name__, provider.model_name, lang, text)
+
+@router.post("/", response_model=AnalysisResponse)
+async def analyze(req: AnalysisRequest):
+    daily, summary_dict, provider, prompt, lang = await _prepare(req)
+    key = _cache_key(provider, lang, prompt)
+    cached = await asyncio.to_thread(llm_cache.lookup, key)
+    if cached is not None:
+        return AnalysisResponse(symbol=daily.symbol, market=daily.market, summary=summary_dict, analysis=cached, cached=True)
     try:
-        analysis_text = provider.generate(prompt)
+        analysis_text = await provider.generate(prompt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    await _cache_store(provider, lang, key, analysis_text)
     return AnalysisResponse(symbol=daily.symbol, market=daily.market, summary=summary_dict, analysis=analysis_text)
+
+def _sse(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream")
+async def analyze_stream(req: AnalysisRequest):
+    """Same as ``/analysis/`` but streams the answer as Server-Sent Events.
+
+    Events: ``summary`` (symbol/market/summary/cached), then unnamed ``{"token": ...}``
+    messages as the model produces text, then ``done`` (or ``error``).
+    A cache hit is sent as a single token.
+    """
+    daily, summary_dict, provider, prompt, lang = await _prepare(req)
+    key = _cache_key(provider, lang, prompt)
+    cached = await asyncio.to_thread(llm_cache.lookup, key)
+
+    async def events():
+        yield _sse({'symbol': daily.symbol, 'market': daily.market, 'summary': summary_dict, 'cached': cached is not None}, event='summary')
+        if cached is not None:
+            yield _sse({'token': cached})
+            yield _sse({}, event='done')
+            return
+        parts = []
+        try:
+            async for token in provider.stream(prompt):
+                parts.append(token)
+                yield _sse({'token': token})
+        except Exception as e:
+            yield _sse({'detail': str(e)}, event='error')
+            return
+        if provider.completed:  # only a whole answer is worth serving again
+            await _cache_store(provider, lang, key, "".join(parts))
+        yield _sse({}, event='done')
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,173 +1,168 @@
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from fastapi import APIRouter, HTTPException, Query, Path
+from fastapi import APIRouter, HTTPException, Query, Path, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from ..schemas.stocks import StockDailyResponse, StockAnalysisSummary, EarningsResponse, EarningsEvent, AnalystEstimates, NewsResponse, NewsItem, MoversResponse, MoversItem
-from ..schemas.stocks import UpcomingEarningsResponse, UpcomingEarningsItem
-from functools import lru_cache
-import yfinance as yf
-from ..storage.cache import get_price_data, maybe_update_intraday, fetch_news
-from ..storage.db import load_news, add_news_items
+from ..schemas.stocks import UpcomingEarningsResponse, UpcomingEarningsItem, StockBatchRequest, StockBatchResponse, BatchSymbol, MAX_DAYS
+from ..storage.cache import get_price_data, get_price_data_many, ensure_prices, get_rollup_data, maybe_update_intraday, refresh_news
+from ..storage.db import load_news
+from ..storage.earnings import upcoming_earnings
+from ..storage.snapshots import SnapshotCache
+from ..storage.symbols import market_symbol, resolve_many
+from ..storage.rollups import ROLLUP_INTERVALS
+from .. import http_client, live
+from ..analytics.summary import summarize_frames
+from ..analytics.streaming import window_summary
+from ..analytics.downsample import downsample_frame
+from ..encoding import encode_frame, encoded_response
+from ..resilience import YAHOO_SCREENER, http_failure
+from ..lazy import lazy_import
+from ..metrics import CACHE_REQUESTS
+from ..tracing import span
 
 router = APIRouter()
+yf = lazy_import("yfinance")
 
-@router.get("/movers", response_model=MoversResponse)
-def get_top_movers(market: str = Query("US", regex="^(US|HK|CN)$"), type: str = Query("gainers", regex="^(gainers|losers)$"), count: int = Query(10, ge=1, le=20)):
-    import httpx
+MOVERS_TTL = float(os.getenv("MOVERS_TTL_SECONDS", "60"))
+MOVERS_MAX_STALE = float(os.getenv("MOVERS_MAX_STALE_SECONDS", "900"))
+# seconds before the second screener host is tried (0 = query both hosts at once)
+MOVERS_HEDGE_DELAY = float(os.getenv("MOVERS_HEDGE_DELAY", "0"))
+# snapshots hold the largest `count` the endpoint accepts and are sliced per request
+_MOVERS_SNAPSHOT_COUNT = 20
+# concurrent live-quote / closing-bar lookups per /stocks/batch request
+BATCH_INTRADAY_WORKERS = int(os.getenv("BATCH_INTRADAY_WORKERS", "8"))
+_SCREENER_HOSTS = (
+    "https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved",
+    "https://query2.finance.yahoo.com/v1/finance/screener/predefined/saved",
+)
+
+def _screener_result(resp) -> list:
+    data = resp.json()
+    return (((data or {}).get('finance') or {}).get('result') or [{}])[0].get('quotes') or []
+
+async def _screener_quotes(region: str, scr: str, count: int) -> list:
+    """Quotes of one predefined screener; both Yahoo hosts are hedged, the first non-empty answer wins."""
+    lang = 'en-US'
+    urls = [f"{base}?lang={lang}&region={region}&count={count}&scrIds={scr}" for base in _SCREENER_HOSTS]
+    seen = []  # every response of the current attempt
+
+    def accept(r):
+        seen.append(r)
+        return r.status_code == 200 and bool(_screener_result(r))
+
+    async def fetch(timeout):
+        seen.clear()
+        return await http_client.hedged_get(urls, accept=accept, hedge_delay=MOVERS_HEDGE_DELAY, timeout=timeout)
+
+    # open circuit -> CircuitOpenError -> the movers cache keeps serving its last snapshot;
+    # 429 / 5xx from every host counts as a failed call
+    resp = await YAHOO_SCREENER.call(fetch, failure=lambda resp: resp is None and bool(seen)
+                                     and all(http_failure(r) for r in seen))
+    return _screener_result(resp) if resp is not None else []
+
+async def _fetch_movers(market: str, type: str) -> list[MoversItem]:
+    """Up to ``_MOVERS_SNAPSHOT_COUNT`` movers, sign-filtered and sorted (uncached)."""
+    count = _MOVERS_SNAPSHOT_COUNT
     # Map to Yahoo Finance screener tags (attempt specific then generic)
-    screener = None
-    if market == 'US':
-        screener_candidates = ['day_gainers' if type == 'gainers' else 'day_losers', 'most_actives']
-    else:
-        # Try dedicated gainers/losers first; Yahoo sometimes supports these regionally
-        screener_candidates = ['day_gainers' if type == 'gainers' else 'day_losers', 'most_actives']
+    screener_candidates = ['day_gainers' if type == 'gainers' else 'day_losers', 'most_actives']
     region = {'US':'US','HK':'HK','CN':'CN'}.get(market, 'US')
-    lang = 'en-US'
-    base1 = "https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved"
-    base2 = "https://query2.finance.yahoo.com/v1/finance/screener/predefined/saved"
-    def _urls(scr: str):
-        return (
-            f"{base1}?lang={lang}&region={region}&count={count}&scrIds={scr}",
-            f"{base2}?lang={lang}&region={region}&count={count}&scrIds={scr}",
-        )
-    items: list[MoversItem] = []
-    try:
-        with httpx.Client(timeout=8.0, headers={"User-Agent": "stock-mcpilot/1.0"}) as client:
-            # try primary, then secondary host
-            quotes = []
-            # Iterate screener candidates until we get quotes
-            quotes = []
-            for scr in screener_candidates:
-                url1, url2 = _urls(scr)
-                for url in (url1, url2):
-                    r = client.get(url)
-                    if r.status_code == 200:
-                        data = r.json()
-                        quotes = (((data or {}).get('finance') or {}).get('result') or [{}])[0].get('quotes') or []
-                        if quotes:
-                            break
-                if quotes:
-                    break
-                # For HK/CN fallbacks we accept result then post-filter by change sign if available
-            raw_items = quotes
-            # If US and requested screener failed (empty), fallback to most_actives then sort by change_pct
-            if market == 'US' and not items:
-                for url in (f"{base1}?lang={lang}&region=US&count=50&scrIds=most_actives", f"{base2}?lang={lang}&region=US&count=50&scrIds=most_actives"):
-                    r = client.get(url)
-                    if r.status_code == 200:
-                        data = r.json()
-                        quotes = (((data or {}).get('finance') or {}).get('result') or [{}])[0].get('quotes') or []
-                        if quotes:
-                            tmp = []
-                            for q in quotes:
-                                chg = q.get('regularMarketChange')
-                                price = q.get('regularMarketPrice')
-                                prev_close = q.get('regularMarketPreviousClose')
-                                if prev_close is None and (price is not None and chg is not None):
-                                    try:
-                                        prev_close = float(price) - float(chg)
-                                    except Exception:
-                                        prev_close = None
-                                calc_pct = None
-                                try:
-                                    if chg is not None and prev_close not in (None, 0):
-                                        calc_pct = (float(chg) / float(prev_close)) * 100.0
-                                except Exception:
-                                    calc_pct = None
-                                if calc_pct is None and q.get('regularMarketChangePercent') is not None:
-                                    try:
-                                        calc_pct = float(q.get('regularMarketChangePercent'))
-                                    except Exception:
-                                        calc_pct = None
-                                sym_fb = q.get('symbol')
-                                tmp.append({
-                                    'symbol': sym_fb,
-                                    'name': q.get('shortName') or q.get('longName'),
-                                    'price': price,
-                                    'change': chg,
-                                    'change_pct': calc_pct,
-                                    'volume': q.get('regularMarketVolume'),
-                                    'market_cap': q.get('marketCap'),
-                                    'currency': q.get('currency'),
-                                })
-                            if type == 'gainers':
-                                tmp.sort(key=lambda x: (x['change_pct'] or 0), reverse=True)
-                            else:
-                                tmp.sort(key=lambda x: (x['change_pct'] or 0))
-                            for q in tmp[:count]:
-                                items.append(MoversItem(**q))
-                            break
-            # Strict market filtering
-            def _is_us(sym: str) -> bool:
-                return not (sym.endswith('.HK') or sym.endswith('.SS') or sym.endswith('.SZ'))
-            def _is_hk(sym: str) -> bool:
-                return sym.endswith('.HK')
-            def _is_cn(sym: str) -> bool:
-                return sym.endswith('.SS') or sym.endswith('.SZ')
-
-            def _match_symbol(sym: str) -> bool:
-                if market == 'US':
-                    return _is_us(sym)
-                if market == 'HK':
-                    return _is_hk(sym)
-                if market == 'CN':
-                    return _is_cn(sym)
-                return False
-
-            filtered_quotes = []
-            for q in (raw_items or []):
-                sym = (q.get('symbol') or '').upper()
-                if not sym:
-                    continue
-                if not _match_symbol(sym):
-                    continue
-                filtered_quotes.append(q)
-
-            if not filtered_quotes:
-                # No genuine symbols for requested market; return empty
-                return MoversResponse(market=market, type=type, count=0, items=[])
-
-            # Build items only from filtered quotes
-            items = []
-            for q in filtered_quotes:
-                chg = q.get('regularMarketChange')
-                chgp_raw = q.get('regularMarketChangePercent')
-                sym = q.get('symbol') or ''
-                cur = q.get('currency')
-                price = q.get('regularMarketPrice')
-                prev_close = q.get('regularMarketPreviousClose')
-                if prev_close is None and (price is not None and chg is not None):
-                    try:
-                        prev_close = float(price) - float(chg)
-                    except Exception:
-                        prev_close = None
+    quotes = []
+    # Iterate screener candidates until we get quotes
+    for scr in screener_candidates:
+        quotes = await _screener_quotes(region, scr, count)
+        if quotes:
+            break
+        # For HK/CN fallbacks we accept result then post-filter by change sign if available
+    # If US and requested screener failed (empty), fallback to a wider most_actives list; sorted by change_pct below
+    if market == 'US' and not quotes:
+        quotes = await _screener_quotes('US', 'most_actives', 50)
+    raw_items = quotes
+    # Strict market filtering
+    def _is_us(sym: str) -> bool:
+        return not (sym.endswith('.HK') or sym.endswith('.SS') or sym.endswith('.SZ'))
+    def _is_hk(sym: str) -> bool:
+        return sym.endswith('.HK')
+    def _is_cn(sym: str) -> bool:
+        return sym.endswith('.SS') or sym.endswith('.SZ')
+
+    def _match_symbol(sym: str) -> bool:
+        if market == 'US':
+            return _is_us(sym)
+        if market == 'HK':
+            return _is_hk(sym)
+        if market == 'CN':
+            return _is_cn(sym)
+        return False
+
+    filtered_quotes = []
+    for q in (raw_items or []):
+        sym = (q.get('symbol') or '').upper()
+        if not sym:
+            continue
+        if not _match_symbol(sym):
+            continue
+        filtered_quotes.append(q)
+
+    if not filtered_quotes:
+        # No genuine symbols for requested market; return empty
+        return []
+
+    # Build items only from filtered quotes
+    items = []
+    for q in filtered_quotes:
+        chg = q.get('regularMarketChange')
+        chgp_raw = q.get('regularMarketChangePercent')
+        sym = q.get('symbol') or ''
+        cur = q.get('currency')
+        price = q.get('regularMarketPrice')
+        prev_close = q.get('regularMarketPreviousClose')
+        if prev_close is None and (price is not None and chg is not None):
+            try:
+                prev_close = float(price) - float(chg)
+            except Exception:
+                prev_close = None
+        change_pct = None
+        try:
+            if chg is not None and prev_close not in (None, 0):
+                change_pct = (float(chg) / float(prev_close)) * 100.0
+        except Exception:
+            change_pct = None
+        if change_pct is None and chgp_raw is not None:
+            try:
+                change_pct = float(chgp_raw)
+            except Exception:
                 change_pct = None
-                try:
-                    if chg is not None and prev_close not in (None, 0):
-                        change_pct = (float(chg) / float(prev_close)) * 100.0
-                except Exception:
-                    change_pct = None
-                if change_pct is None and chgp_raw is not None:
-                    try:
-                        change_pct = float(chgp_raw)
-                    except Exception:
-                        change_pct = None
-                items.append(MoversItem(
-                    symbol=sym,
-                    name=q.get('shortName') or q.get('longName'),
-                    price=price,
-                    change=chg,
-                    change_pct=change_pct,
-                    volume=q.get('regularMarketVolume'),
-                    market_cap=q.get('marketCap'),
-                    currency=cur,
-                ))
+        items.append(MoversItem(
+            symbol=sym,
+            name=q.get('shortName') or q.get('longName'),
+            price=price,
+            change=chg,
+            change_pct=change_pct,
+            volume=q.get('regularMarketVolume'),
+            market_cap=q.get('marketCap'),
+            currency=cur,
+        ))
 
-            # Sign filtering and sorting for all markets
-            if items:
-                signed = [it for it in items if ((it.change_pct or 0) >= 0)] if type == 'gainers' else [it for it in items if ((it.change_pct or 0) < 0)]
-                if not signed:
-                    return MoversResponse(market=market, type=type, count=0, items=[])
-                signed.sort(key=lambda x: (x.change_pct or 0), reverse=(type == 'gainers'))
-                items = signed[:count]
+    # Sign filtering and sorting for all markets
+    if items:
+        signed = [it for it in items if ((it.change_pct or 0) >= 0)] if type == 'gainers' else [it for it in items if ((it.change_pct or 0) < 0)]
+        if not signed:
+            return []
+        signed.sort(key=lambda x: (x.change_pct or 0), reverse=(type == 'gainers'))
+        items = signed
+    return items
+
+_movers_cache = SnapshotCache(_fetch_movers, ttl=MOVERS_TTL, max_stale=MOVERS_MAX_STALE, name='movers')
+
+@router.get("/movers", response_model=MoversResponse)
+async def get_top_movers(market: str = Query("US", regex="^(US|HK|CN)$"), type: str = Query("gainers", regex="^(gainers|losers)$"), count: int = Query(10, ge=1, le=20)):
+    # served from the (market, type) snapshot; refreshed in the background once stale
+    try:
+        items = (await _movers_cache.get(market, type))[:count]
     except Exception:
         items = []
     return MoversResponse(market=market, type=type, count=len(items), items=items)
@@ -178,114 +173,21 @@ def get_upcoming_earnings(market: str = Query("US", regex="^(US|HK|CN)$"), days:
 
     NOTE: Placed before dynamic /{symbol} route to avoid path parameter capture causing 404/422.
 
-    Current implementation:
-    - US: Iterate a representative symbol universe and query yfinance for forward earnings dates.
-    - HK/CN: Placeholder returns empty (future enhancement: integrate akshare or other sources).
+    Served from the stored earnings calendar (see storage.earnings); the US universe
+    is refreshed concurrently once the snapshot is older than EARNINGS_TTL_HOURS.
+    HK/CN: Placeholder returns empty (future enhancement: integrate akshare or other sources).
     """
-    items: list[UpcomingEarningsItem] = []
-    from datetime import datetime, timedelta as _td
-    end_date = datetime.utcnow().date() + _td(days=days)
-    if market == 'US':
-        sample_symbols = [
-            'AAPL','MSFT','AMZN','GOOGL','META','NVDA','TSLA','ORCL','INTC','NFLX','CRM','AMD','QCOM','CSCO','ADBE','PYPL','PEP','COST','AVGO','TXN',
-            'JPM','BAC','WFC','V','MA','KO','PFE','ABBV','MRK','XOM','CVX','UNH','HD','WMT','DIS','NKE','LIN','TMO','ABNB','SNOW','SHOP'
-        ]
-        import yfinance as _yf, pandas as _pd
-        today = datetime.utcnow().date()
-        for sym in sample_symbols:
-            if len(items) >= limit:
-                break
-            try:
-                tkr = _yf.Ticker(sym)
-                earns_df = None
-                if hasattr(tkr, 'get_earnings_dates'):
-                    try:
-                        earns_df = tkr.get_earnings_dates(limit=12)
-                    except Exception:
-                        earns_df = None
-                future_date = None
-                if earns_df is not None and not earns_df.empty:
-                    for idx in earns_df.index:
-                        try:
-                            d = idx.date() if hasattr(idx, 'date') else _pd.to_datetime(idx).date()
-                            if d >= today and d <= end_date:
-                                future_date = d; break
-                        except Exception:
-                            continue
-                if future_date is None:
-                    cal = None
-                    for attr in ['get_calendar','calendar']:
-                        v = getattr(tkr, attr, None)
-                        try:
-                            cal = v() if callable(v) else v
-                            if cal is not None and hasattr(cal,'empty') and not cal.empty:
-                                break
-                        except Exception:
-                            continue
-                    if cal is not None and hasattr(cal,'to_dict'):
-                        dct = cal.to_dict(); flat = []
-                        for k, vs in dct.items():
-                            if isinstance(vs, dict): vs = list(vs.values())
-                            for vv in (vs or []): flat.append(vv)
-                        for vv in flat:
-                            try:
-                                ts = _pd.to_datetime(vv, errors='coerce')
-                                if ts is not None and ts is not _pd.NaT:
-                                    dd = ts.date()
-                                    if dd >= today and dd <= end_date:
-                                        future_date = dd; break
-                            except Exception:
-                                continue
-                if future_date:
-                    short_name = None
-                    try:
-                        info = getattr(tkr, 'info', {}) if hasattr(tkr, 'info') else {}
-                        if isinstance(info, dict):
-                            short_name = info.get('shortName') or info.get('longName')
-                    except Exception:
-                        short_name = None
-                    items.append(UpcomingEarningsItem(symbol=sym, name=short_name, earnings_date=str(future_date), session=None))
-            except Exception:
-                continue
-        items.sort(key=lambda x: x.earnings_date or '')
-    else:
-        items = []
-    return UpcomingEarningsResponse(market=market, count=len(items), items=items)
-
-@lru_cache(maxsize=512)
-def _company_name(symbol: str, market: str):
-    # Determine yfinance symbol as in storage.cache._market_symbol
-    yf_symbol = symbol
-    if market == 'HK' and not yf_symbol.endswith('.HK'):
-        yf_symbol += '.HK'
-    if market == 'CN':
-        if symbol.startswith('6'):
-            yf_symbol += '.SS'
-        else:
-            yf_symbol += '.SZ'
     try:
-        t = yf.Ticker(yf_symbol)
-        info = t.fast_info if hasattr(t, 'fast_info') else {}
-        name = getattr(t, 'info', {}).get('shortName') if hasattr(t, 'info') else None
-        if not name and isinstance(info, dict):
-            name = info.get('shortName') or info.get('longName')
-        return name
+        rows = upcoming_earnings(market, days, limit)
     except Exception:
-        return None
+        rows = []
+    items = [
+        UpcomingEarningsItem(symbol=r['symbol'], name=r['name'], earnings_date=str(r['earnings_date']), session=r['session'])
+        for r in rows
+    ]
+    return UpcomingEarningsResponse(market=market, count=len(items), items=items)
 
-@router.get("/{symbol}", response_model=StockDailyResponse)
-def get_stock_daily(
-    symbol: str = Path(..., regex=r"^[A-Za-z0-9\.]{1,15}$"),
-    market: str = Query("US", regex="^(US|HK|CN)$"),
-    days: int = 60
-):
-    symbol = symbol.upper().strip()
-    end = date.today()
-    start = end - timedelta(days=days*2)  # buffer for non-trading days
-    try:
-        df = get_price_data(symbol=symbol, market=market, start=start, end=end)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def _merge_intraday(df, symbol: str, market: str):
     # Intraday update: if market open, attempt to update today's row with live price
     try:
         updated = maybe_update_intraday(symbol, market)
@@ -304,12 +206,16 @@ def get_stock_daily(
             df = df.sort_index()
     except Exception:
         pass  # fail silently for live updates
-    if df.empty:
-        raise HTTPException(status_code=404, detail="No data")
-    df = df.tail(days)
-    summary = StockAnalysisSummary.from_dataframe(df)
+    return df
+
+def _daily_response(symbol: str, market: str, df, summary: StockAnalysisSummary,
+                    meta: dict | None = None, bars=None, interval: str = "1d") -> StockDailyResponse:
+    """Build the /{symbol} response from a non-empty, already trimmed price frame.
+
+    ``bars`` (default ``df``) are the rows to return, e.g. a downsampled ``df``.
+    """
     # 统一前端所需行结构: date 字段
-    df_out = df.copy()
+    df_out = (df if bars is None else bars).copy()
     # 处理已有 'date' 列冲突：如果数据里已经有 date 列，则用临时索引名再改回
     index_name = 'date'
     if 'date' in df_out.columns:
@@ -323,9 +229,10 @@ def get_stock_daily(
             df_rows.drop(columns=['date'], inplace=True, errors='ignore')
         df_rows.rename(columns={index_name: 'date'}, inplace=True)
     rows = df_rows.to_dict(orient="records")
-    name_en = _company_name(symbol, market)
-    # Placeholder: Chinese name resolution could be added via akshare later.
-    name_zh = None
+    if meta is None:
+        with span("company_name"):
+            meta = resolve_many([(symbol, market)])[(symbol, market)]
+    name_en, name_zh = meta['name_en'], meta['name_zh']
     return StockDailyResponse(
         symbol=symbol,
         market=market,
@@ -334,23 +241,220 @@ def get_stock_daily(
         rows=rows,
         summary=summary,
         company_name_en=name_en,
-        company_name_zh=name_zh
+        company_name_zh=name_zh,
+        interval=interval,
     )
 
+@router.post("/batch", response_model=StockBatchResponse)
+def get_stocks_batch(req: StockBatchRequest):
+    """Daily data for many symbols; cache misses are fetched with one multi-ticker download."""
+    pairs = list(dict.fromkeys((it.symbol.upper().strip(), it.market) for it in req.items))
+    end = date.today()
+    start = end - timedelta(days=req.days*2)  # buffer for non-trading days
+    try:
+        frames = get_price_data_many(pairs, start=start, end=end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # live quotes are per-ticker upstream calls: look them up concurrently, not one by one
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_INTRADAY_WORKERS, len(pairs)))) as pool:
+        merged = pool.map(lambda pair: _merge_intraday(frames[pair], *pair).tail(req.days), pairs)
+        frames = dict(zip(pairs, merged))
+    # one vectorized pass over all symbols instead of from_dataframe per symbol
+    summaries = summarize_frames(frames)
+    # names for all symbols in one query (and one concurrent scrape for unknown ones)
+    metas = resolve_many([pair for pair in pairs if not frames[pair].empty])
+    items: list[StockDailyResponse] = []
+    missing: list[BatchSymbol] = []
+    for symbol, market in pairs:
+        df = frames[(symbol, market)]
+        if df.empty:
+            missing.append(BatchSymbol(symbol=symbol, market=market))
+        else:
+            items.append(_daily_response(symbol, market, df, summaries[(symbol, market)], metas[(symbol, market)]))
+    return StockBatchResponse(items=items, missing=missing)
+
+_STREAM_SYMBOL = re.compile(r"^(?:(US|HK|CN):)?([A-Za-z0-9\.]{1,15})$")
+_STREAM_MAX_SYMBOLS = 50
+_STREAM_HEARTBEAT = 15.0  # seconds between SSE keep-alive comments
+
+def _stream_keys(symbols, market: str) -> list[tuple]:
+    """``["AAPL", "HK:0700"]`` (or one comma separated string) -> [(symbol, market)]."""
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    keys = []
+    for item in symbols:
+        item = str(item).strip()
+        if not item:
+            continue
+        m = _STREAM_SYMBOL.match(item.upper())
+        if m is None:
+            raise ValueError(f"invalid symbol: {item!r}")
+        key = (m.group(2), m.group(1) or market)
+        if key not in keys:
+            keys.append(key)
+    if len(keys) > _STREAM_MAX_SYMBOLS:
+        raise ValueError(f"at most {_STREAM_MAX_SYMBOLS} symbols per stream")
+    return keys
+
+@router.get("/stream")
+async def stream_quotes(
+    symbols: str = Query(..., description="Comma separated, e.g. AAPL,MSFT,HK:0700"),
+    market: str = Query("US", regex="^(US|HK|CN)$"),
+):
+    """Live quotes as Server-Sent Events: ``quote`` events carry a full snapshot first,
+    then only the changed fields. Upstream is polled once per symbol for all viewers."""
+    try:
+        keys = _stream_keys(symbols, market)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not keys:
+        raise HTTPException(status_code=422, detail="no symbols")
+
+    async def events():
+        sub = live.Subscriber()
+        for key in keys:
+            live.hub.subscribe(sub, *key)
+        try:
+            while True:
+                try:
+                    msg = await asyncio.wait_for(sub.queue.get(), timeout=_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # keeps proxies from closing an idle stream
+                    continue
+                yield f"event: quote\ndata: {json.dumps(msg)}\n\n"
+        finally:
+            live.hub.unsubscribe_all(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/stream")
+async def stream_quotes_ws(ws: WebSocket):
+    """WebSocket variant of ``/stream``. Client messages:
+    ``{"action": "subscribe"|"unsubscribe", "symbols": [...], "market": "US"}``."""
+    await ws.accept()
+    sub = live.Subscriber()
+
+    async def sender():
+        while True:
+            await ws.send_json(await sub.queue.get())
+
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            req = await ws.receive_json()
+            action = req.get("action") if isinstance(req, dict) else None
+            market = req.get("market", "US") if isinstance(req, dict) else "US"
+            if action not in ("subscribe", "unsubscribe") or market not in ("US", "HK", "CN"):
+                await ws.send_json({"error": "expected {action: subscribe|unsubscribe, symbols: [...], market}"})
+                continue
+            try:
+                keys = _stream_keys(req.get("symbols") or [], market)
+                if action == "subscribe" and len(sub.keys | set(keys)) > _STREAM_MAX_SYMBOLS:
+                    raise ValueError(f"at most {_STREAM_MAX_SYMBOLS} symbols per stream")
+            except ValueError as e:
+                await ws.send_json({"error": str(e)})
+                continue
+            for key in keys:
+                if action == "subscribe":
+                    live.hub.subscribe(sub, *key)
+                else:
+                    live.hub.unsubscribe(sub, *key)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        send_task.cancel()
+        live.hub.unsubscribe_all(sub)
+
+@router.get("/{symbol}", response_model=StockDailyResponse)
+def get_stock_daily(
+    symbol: str = Path(..., regex=r"^[A-Za-z0-9\.]{1,15}$"),
+    market: str = Query("US", regex="^(US|HK|CN)$"),
+    days: int = Query(60, ge=1, le=MAX_DAYS),
+    format: str = Query("rows", regex="^(rows|columnar|arrow|msgpack)$"),
+    max_points: int | None = Query(None, ge=3, le=10000),
+    downsample: str = Query("lttb", regex="^(lttb|ohlc)$"),
+    interval: str = Query("1d", regex=r"^(1d|1wk|1mo|[1-9][0-9]*d)$"),
+    accept_encoding: str | None = Header(None),
+):
+    """Daily bars. ``format=rows`` (default) returns one object per row; ``columnar``
+    returns one array per column, ``arrow`` / ``msgpack`` the same as binary.
+
+    ``max_points`` caps the returned rows for charts: ``downsample=lttb`` keeps the
+    visually significant bars of the close line, ``ohlc`` merges bars into candles.
+    The summary always covers the full window.
+
+    ``interval=1wk`` / ``1mo`` (or an N-day interval listed in ``ROLLUP_INTERVALS``)
+    returns the precomputed rollup bars covering the last ``days`` trading days
+    instead; the summary is then computed over those bars."""
+    symbol = symbol.upper().strip()
+    if interval != "1d" and interval not in ROLLUP_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be 1d or one of: {', '.join(ROLLUP_INTERVALS)}")
+    end = date.today()
+    if interval != "1d":
+        df, summary = _rollup_window(symbol, market, days, interval, end)
+    else:
+        start = end - timedelta(days=days*2)  # buffer for non-trading days
+        try:
+            df = get_price_data(symbol=symbol, market=market, start=start, end=end)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        df = _merge_intraday(df, symbol, market)
+        if df.empty:
+            raise HTTPException(status_code=404, detail="No data")
+        df = df.tail(days)
+        # incremental: between intraday refreshes only the last bar changes
+        with span("summary"):
+            summary = window_summary(symbol, market, days, df)
+    bars = df
+    if max_points is not None and len(df) > max_points:
+        with span("downsample"):
+            bars = downsample_frame(df, max_points, downsample)
+    if format == "rows":
+        with span("serialize"):
+            return _daily_response(symbol, market, df, summary, bars=bars, interval=interval)
+    with span("company_name"):
+        names = resolve_many([(symbol, market)])[(symbol, market)]
+    meta = {
+        "symbol": symbol,
+        "market": market,
+        "interval": interval,
+        "start": str(df.index.min().date()),
+        "end": str(df.index.max().date()),
+        "summary": summary.model_dump(),
+        "company_name_en": names['name_en'],
+        "company_name_zh": names['name_zh'],
+    }
+    with span("serialize"):
+        return encoded_response(encode_frame(format, bars, meta), format, accept_encoding)
+
+def _rollup_window(symbol: str, market: str, days: int, interval: str, end: date):
+    """Rollup bars of ``interval`` covering the last ``days`` trading days, plus their summary.
+
+    The daily bars are only fetched / refreshed into the store (which keeps the
+    rollups current); the response itself is read from ``price_rollups``.
+    """
+    start = end - timedelta(days=days * 365 // 252 + 1)  # trading days -> calendar days
+    try:
+        ensure_prices(symbol, market, start, end)
+        try:
+            maybe_update_intraday(symbol, market)
+        except Exception:
+            pass  # fail silently for live updates
+        df = get_rollup_data(symbol, market, interval, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No data")
+    with span("summary"):
+        summary = StockAnalysisSummary.from_dataframe(df)
+    return df, summary
+
 
 @router.get("/{symbol}/earnings", response_model=EarningsResponse)
 def get_stock_earnings(symbol: str, market: str = Query("US", regex="^(US|HK|CN)$")):
     symbol = symbol.upper().strip()
-    # Map to yfinance symbol similar to cache._market_symbol
-    yf_symbol = symbol
-    if market == 'HK' and not yf_symbol.endswith('.HK'):
-        yf_symbol += '.HK'
-    if market == 'CN':
-        if symbol.startswith('6'):
-            yf_symbol += '.SS'
-        else:
-            yf_symbol += '.SZ'
-    t = yf.Ticker(yf_symbol)
+    t = yf.Ticker(market_symbol(symbol, market))
     events: list[EarningsEvent] = []
     next_earnings_date: str | None = None
     analyst: AnalystEstimates | None = None
@@ -450,109 +554,17 @@ def get_stock_earnings(symbol: str, market: str = Query("US", regex="^(US|HK|CN)
     return EarningsResponse(symbol=symbol, market=market, next_earnings_date=next_earnings_date, events=events, analyst=analyst)
 
 
+_NEWS_CACHE_RESULT = {'fresh': 'hit', 'not_modified': 'revalidated', 'updated': 'miss', 'failed': 'stale'}
+
 @router.get("/{symbol}/news", response_model=NewsResponse)
-def get_stock_news(symbol: str, market: str = Query("US", regex="^(US|HK|CN)$")):
+async def get_stock_news(symbol: str, market: str = Query("US", regex="^(US|HK|CN)$")):
     symbol = symbol.upper().strip()
-    # try cache first
-    cached = load_news(symbol, market)
-    items: list[NewsItem] = [NewsItem(published_at=str(r['published_at']), text=r['text']) for r in cached]
-    # fetch fresh best-effort, then upsert and return top 10
-    fresh = fetch_news(symbol, market)
-    if fresh:
-        try:
-            add_news_items(symbol, market, fresh)
-            cached = load_news(symbol, market)
-            items = [NewsItem(published_at=str(r['published_at']), text=r['text']) for r in cached]
-        except Exception:
-            pass
+    # refresh the stored headlines if their TTL expired (conditional, best-effort), then serve from the DB
+    try:
+        status = await refresh_news(symbol, market)
+    except Exception:
+        status = 'failed'
+    CACHE_REQUESTS.inc('news', _NEWS_CACHE_RESULT[status])
+    cached = await asyncio.to_thread(load_news, symbol, market)
+    items = [NewsItem(published_at=str(r['published_at']), text=r['text']) for r in cached]
     return NewsResponse(symbol=symbol, market=market, items=items[:10])
-
-
-@router.get("/upcoming_earnings", response_model=UpcomingEarningsResponse)
-def get_upcoming_earnings(market: str = Query("US", regex="^(US|HK|CN)$"), days: int = Query(14, ge=1, le=60), limit: int = Query(50, ge=1, le=200)):
-    """Return upcoming earnings (best-effort).
-
-    Current implementation:
-    - US: Scrape yfinance earnings calendar via tickers derived from major indices ETFs components fallback (simplified) or yfinance calendar endpoints if accessible.
-    - HK/CN: Placeholder returns empty (akshare integration could be added later).
-    """
-    items: list[UpcomingEarningsItem] = []
-    from datetime import datetime, timedelta
-    end_date = datetime.utcnow().date() + timedelta(days=days)
-    if market == 'US':
-        # Broaden sample list (top weights of S&P/Nasdaq + a few others)
-        sample_symbols = [
-            'AAPL','MSFT','AMZN','GOOGL','META','NVDA','TSLA','ORCL','INTC','NFLX','CRM','AMD','QCOM','CSCO','ADBE','PYPL','PEP','COST','AVGO','TXN',
-            'JPM','BAC','WFC','V','MA','KO','PFE','ABBV','MRK','XOM','CVX','UNH','HD','WMT','DIS','NKE','LIN','TMO','ABNB','SNOW','SHOP'
-        ]
-        import yfinance as yf, pandas as pd
-        today = datetime.utcnow().date()
-        for sym in sample_symbols:
-            if len(items) >= limit:
-                break
-            try:
-                t = yf.Ticker(sym)
-                # Try get_earnings_dates first for forward dates
-                earns_df = None
-                if hasattr(t, 'get_earnings_dates'):
-                    try:
-                        earns_df = t.get_earnings_dates(limit=12)
-                    except Exception:
-                        earns_df = None
-                future_date = None
-                if earns_df is not None and not earns_df.empty:
-                    # index holds dates; pick the first date >= today within window
-                    for idx in earns_df.index:
-                        try:
-                            d = idx.date() if hasattr(idx, 'date') else pd.to_datetime(idx).date()
-                            if d >= today and d <= end_date:
-                                future_date = d
-                                break
-                        except Exception:
-                            continue
-                # Fallback to calendar
-                if future_date is None:
-                    cal = None
-                    for attr in ['get_calendar','calendar']:
-                        v = getattr(t, attr, None)
-                        try:
-                            cal = v() if callable(v) else v
-                            if cal is not None and hasattr(cal,'empty') and not cal.empty:
-                                break
-                        except Exception:
-                            continue
-                    if cal is not None and hasattr(cal,'to_dict'):
-                        dct = cal.to_dict()
-                        flat_vals = []
-                        for k, vs in dct.items():
-                            if isinstance(vs, dict):
-                                vs = list(vs.values())
-                            for v in (vs or []):
-                                flat_vals.append(v)
-                        for v in flat_vals:
-                            try:
-                                ts = pd.to_datetime(v, errors='coerce')
-                                if ts is not None and ts is not pd.NaT:
-                                    dd = ts.date()
-                                    if dd >= today and dd <= end_date:
-                                        future_date = dd
-                                        break
-                            except Exception:
-                                continue
-                if future_date:
-                    # Fetch company short name best-effort
-                    short_name = None
-                    try:
-                        info = getattr(t, 'info', {}) if hasattr(t, 'info') else {}
-                        if isinstance(info, dict):
-                            short_name = info.get('shortName') or info.get('longName')
-                    except Exception:
-                        short_name = None
-                    items.append(UpcomingEarningsItem(symbol=sym, name=short_name, earnings_date=str(future_date), session=None))
-            except Exception:
-                continue
-        items.sort(key=lambda x: x.earnings_date or '')
-    else:
-        # HK/CN not implemented yet -> return empty
-        items = []
-    return UpcomingEarningsResponse(market=market, count=len(items), items=items)
@@ -1,5 +1,11 @@
+from typing import TYPE_CHECKING
 from pydantic import BaseModel, Field
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# upper bound of the `days` window on the price routes (~40 trading years)
+MAX_DAYS = 10000
 
 class StockAnalysisSummary(BaseModel):
     count: int
@@ -10,7 +16,7 @@ class StockAnalysisSummary(BaseModel):
     volatility_pct: float = Field(..., description="近段时间收益标准差 *100")
 
     @classmethod
-    def from_dataframe(cls, df: pd.DataFrame):
+    def from_dataframe(cls, df: "pd.DataFrame"):
         close = df['close'] if 'close' in df.columns else df['Close']
         volume = df['volume'] if 'volume' in df.columns else df.get('Volume', close*0)
         ret_pct = (close.iloc[-1] / close.iloc[0] - 1) * 100
@@ -36,6 +42,22 @@ class StockDailyResponse(BaseModel):
     summary: StockAnalysisSummary
     company_name_en: str | None = None
     company_name_zh: str | None = None
+    interval: str = "1d"  # bar size: 1d, or a rollup interval (1wk, 1mo, Nd)
+
+
+class BatchSymbol(BaseModel):
+    symbol: str = Field(..., pattern=r"^[A-Za-z0-9\.]{1,15}$")
+    market: str = Field("US", pattern="^(US|HK|CN)$")
+
+
+class StockBatchRequest(BaseModel):
+    items: list[BatchSymbol] = Field(..., min_length=1, max_length=200)
+    days: int = Field(60, ge=1, le=MAX_DAYS)
+
+
+class StockBatchResponse(BaseModel):
+    items: list[StockDailyResponse] = []
+    missing: list[BatchSymbol] = []  # symbols without any price data
 
 
 class EarningsEvent(BaseModel):
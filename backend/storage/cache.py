@@ -1,25 +1,21 @@
+from __future__ import annotations
+import asyncio
+import os
+import time as time_mod
 from datetime import date, datetime, time, timedelta
-import pandas as pd
-from .db import load_prices, upsert_prices, add_news_items, load_news
-
-def _market_symbol(symbol: str, market: str) -> str:
-    if market == "HK" and not symbol.endswith(".HK"):
-        return symbol + ".HK"
-    if market == "CN":
-        # Simplified suffix mapping (could use akshare for exact exchange)
-        if symbol.startswith("6"):
-            return symbol + ".SS"
-        else:
-            return symbol + ".SZ"
-    return symbol
+from ..lazy import lazy_import
+from .db import add_news_items, load_coverage, add_coverage, load_news_refresh, put_news_refresh
+from .price_store import get_price_store
+from . import rollups
+from .symbols import market_symbol as _market_symbol
+from ..resilience import YFINANCE, YAHOO_RSS, CircuitOpenError, http_failure
+from ..metrics import CACHE_REQUESTS
+from ..tracing import timed
 
-def fetch_remote(symbol: str, market: str, start, end) -> pd.DataFrame:
-    yf_symbol = _market_symbol(symbol, market)
-    import yfinance as yf
-    df = yf.download(yf_symbol, start=start, end=end, auto_adjust=False, progress=False)
-    if df.empty:
-        return df
-    # 处理可能出现的 MultiIndex (单股票某些场景或未来扩展多股票导致)
+pd = lazy_import("pandas")
+
+def _normalize_frame(df: pd.DataFrame, symbol: str, market: str, yf_symbol: str) -> pd.DataFrame:
+    # 处理可能出现的 MultiIndex (单股票某些场景或多股票下载)
     if isinstance(df.columns, pd.MultiIndex):
         new_cols = []
         for col in df.columns:  # col is a tuple
@@ -43,53 +39,201 @@ def fetch_remote(symbol: str, market: str, start, end) -> pd.DataFrame:
     df['market'] = market
     return df
 
+@timed("fetch_remote")
+def fetch_remote(symbol: str, market: str, start, end) -> pd.DataFrame:
+    yf_symbol = _market_symbol(symbol, market)
+    import yfinance as yf
+    # an empty frame is a valid "no data" answer (holiday, unknown ticker, before listing):
+    # only raised errors and timeouts count against the shared breaker
+    df = YFINANCE.call_sync(yf.download, yf_symbol, start=start, end=end, auto_adjust=False, progress=False,
+                            timeout=YFINANCE.timeout())
+    if df.empty:
+        return df
+    return _normalize_frame(df, symbol, market, yf_symbol)
+
+@timed("fetch_remote")
+def fetch_remote_many(pairs: list[tuple], start, end) -> dict[tuple, pd.DataFrame]:
+    """Download several (symbol, market) pairs with a single multi-ticker ``yf.download``.
+
+    Returns {(symbol, market): DataFrame}; pairs without data map to an empty frame.
+    """
+    yf_symbols = {pair: _market_symbol(*pair) for pair in pairs}
+    out = {pair: pd.DataFrame() for pair in pairs}
+    if not pairs:
+        return out
+    import yfinance as yf
+    df = YFINANCE.call_sync(yf.download, sorted(set(yf_symbols.values())), start=start, end=end,
+                            auto_adjust=False, progress=False, group_by='ticker', timeout=YFINANCE.timeout())
+    if df is None or df.empty:
+        return out
+    tickers = set(df.columns.get_level_values(0)) if isinstance(df.columns, pd.MultiIndex) else set()
+    for (symbol, market), yf_symbol in yf_symbols.items():
+        if tickers:
+            if yf_symbol not in tickers:
+                continue
+            part = df[yf_symbol].copy()
+        else:
+            part = df.copy()  # single ticker without MultiIndex
+        # 多股票下载按并集日期对齐, 去掉该股票无数据的行
+        part = part.dropna(how='all')
+        if part.empty:
+            continue
+        out[(symbol, market)] = _normalize_frame(part, symbol, market, yf_symbol)
+    return out
+
+def _parse_holidays(spec: str) -> dict[str, set]:
+    """``"US:2026-11-26,HK:2026-12-25"`` -> {'US': {date(2026, 11, 26)}, 'HK': {...}}."""
+    out: dict[str, set] = {}
+    for item in spec.split(','):
+        market, _, day = item.strip().partition(':')
+        if day:
+            out.setdefault(market.strip().upper(), set()).add(date.fromisoformat(day.strip()))
+    return out
+
+# known exchange holidays (weekends are always non-trading days)
+MARKET_HOLIDAYS = _parse_holidays(os.getenv("MARKET_HOLIDAYS", ""))
+
+def _is_trading_day(market: str, d: date) -> bool:
+    return d.weekday() < 5 and d not in MARKET_HOLIDAYS.get(market.upper(), ())
+
+def _last_closed_date(market: str) -> date:
+    """Latest calendar date whose daily bar can no longer change (market-local).
+
+    Today only counts once the regular close has passed: a lunch break (HK / CN)
+    is 'closed' for ``_session_status`` but the afternoon session is still to come.
+    """
+    now = datetime.now(ZoneInfo(_MARKET_TZ.get(market.upper(), 'America/New_York')))
+    today = now.date()
+    if not _is_trading_day(market, today) or now.time() >= _MARKET_CLOSE.get(market.upper(), time(16, 0)):
+        return today
+    return today - timedelta(days=1)
+
+def _missing_ranges(start: date, end: date, covered: list[tuple]) -> list[tuple]:
+    """Sub-ranges of [start, end] not contained in the sorted ``covered`` ranges."""
+    gaps = []
+    cur = start
+    for c_start, c_end in covered:
+        if c_end < cur:
+            continue
+        if c_start > end:
+            break
+        if c_start > cur:
+            gaps.append((cur, c_start - timedelta(days=1)))
+        cur = max(cur, c_end + timedelta(days=1))
+        if cur > end:
+            break
+    if cur <= end:
+        gaps.append((cur, end))
+    return gaps
+
+# An empty download of a gap that reaches the last closed session and holds trading days
+# may be a bar not published yet or a transient failure (yfinance returns an empty frame
+# rather than raising): it is retried after this long. Once the gap is older than the last
+# closed session an empty answer is final (holiday, unknown ticker, before listing) and the
+# gap is recorded as covered, so nothing is re-downloaded indefinitely.
+EMPTY_GAP_RETRY = float(os.getenv("EMPTY_GAP_RETRY_SECONDS", "600"))
+_empty_gaps: dict[tuple, float] = {}
+
+@timed("load_prices")
+def _load_price_frame(symbol: str, market: str, start: date, end: date) -> pd.DataFrame:
+    return get_price_store().load_frame(symbol, market, start, end)
+
+def _price_gaps(symbol: str, market: str, start: date, end: date) -> list[tuple]:
+    fetch_until = min(end, _last_closed_date(market))
+    if start > fetch_until:
+        return []
+    gaps = _missing_ranges(start, fetch_until, load_coverage(symbol, market))
+    now = time_mod.monotonic()
+    return [g for g in gaps if now - _empty_gaps.get((symbol, market) + g, -EMPTY_GAP_RETRY) >= EMPTY_GAP_RETRY]
+
+@timed("upsert_prices")
+def _store_fetched(symbol: str, market: str, remote: pd.DataFrame, gaps: list[tuple]):
+    """Upsert a downloaded frame and record the gaps it filled as covered."""
+    if not remote.empty:
+        get_price_store().upsert_frame(symbol, market, remote)
+    last_closed = _last_closed_date(market)
+    for gap_start, gap_end in gaps:
+        if remote.empty and gap_end >= last_closed and any(
+                _is_trading_day(market, gap_start + timedelta(days=i)) for i in range((gap_end - gap_start).days + 1)):
+            now = time_mod.monotonic()
+            if len(_empty_gaps) > 10_000:
+                for key in [k for k, t in _empty_gaps.items() if now - t >= EMPTY_GAP_RETRY]:
+                    del _empty_gaps[key]
+            _empty_gaps[(symbol, market, gap_start, gap_end)] = now
+            continue
+        _empty_gaps.pop((symbol, market, gap_start, gap_end), None)
+        add_coverage(symbol, market, gap_start, gap_end)
+
+def ensure_prices(symbol: str, market: str, start: date, end: date):
+    """Download the date ranges of [start, end] not yet covered into the price store."""
+    gaps = _price_gaps(symbol, market, start, end)
+    CACHE_REQUESTS.inc('prices', 'miss' if gaps else 'hit')
+    for gap in gaps:
+        # yfinance 的 end 是非包含（右开）区间；向后加一天以包含 gap 末日
+        try:
+            remote = fetch_remote(symbol, market, gap[0], gap[1] + timedelta(days=1))
+        except CircuitOpenError:
+            break  # yfinance is down: serve what is stored
+        _store_fetched(symbol, market, remote, [gap])
+
 def get_price_data(symbol: str, market: str, start: date, end: date) -> pd.DataFrame:
-    cached_rows = load_prices(symbol, market, start, end)
-    if cached_rows:
-        df_cached = pd.DataFrame(cached_rows)
-        df_cached.set_index(pd.to_datetime(df_cached['date']), inplace=True)
-        df_cached = df_cached.sort_index()
-    else:
-        df_cached = pd.DataFrame()
-    need_fetch = True
-    if not df_cached.empty:
-        # naive gap detection
-        days = (end - start).days + 1
-        if len(df_cached) > days * 0.5:  # have >50% days -> still try fetch to fill
-            need_fetch = True
-    if need_fetch:
-        # yfinance 的 end 是非包含（右开）区间；为了确保包含“今天”尚在交易或刚收盘的日线，向后加一天
-        fetch_end = end + timedelta(days=1)
-        remote = fetch_remote(symbol, market, start, fetch_end)
-        if not remote.empty:
-            to_upsert = []
-            for idx, row in remote.iterrows():
-                to_upsert.append({
-                    'symbol': symbol,
-                    'market': market,
-                    'date': idx.date(),
-                    'open': float(row.get('open', 0)),
-                    'high': float(row.get('high', 0)),
-                    'low': float(row.get('low', 0)),
-                    'close': float(row.get('close', 0)),
-                    'volume': int(row.get('volume', 0)),
-                })
-            upsert_prices(to_upsert)
-            cached_rows = load_prices(symbol, market, start, end)
-            df_cached = pd.DataFrame(cached_rows)
-            if not df_cached.empty:
-                df_cached.set_index(pd.to_datetime(df_cached['date']), inplace=True)
-    return df_cached
+    """Daily bars for [start, end], downloading only the date ranges not yet covered.
+
+    Closed history recorded in ``price_coverage`` is treated as immutable and
+    served from SQLite. The still-trading session is left to ``maybe_update_intraday``.
+    """
+    ensure_prices(symbol, market, start, end)
+    return _load_price_frame(symbol, market, start, end)
+
+@timed("load_rollups")
+def get_rollup_data(symbol: str, market: str, interval: str, start: date, end: date) -> pd.DataFrame:
+    """Weekly / monthly / N-day bars overlapping [start, end], read from the precomputed rollups.
+
+    Call ``ensure_prices`` (and ``maybe_update_intraday``) first: rollups are derived
+    from the stored daily bars and follow every write to them.
+    """
+    return rollups.load_rollup_frame(get_price_store(), symbol, market, interval, start, end)
+
+def get_price_data_many(pairs: list[tuple], start: date, end: date) -> dict[tuple, pd.DataFrame]:
+    """Batch variant of ``get_price_data`` for many (symbol, market) pairs.
+
+    Cache misses sharing the same missing window are fetched together in one
+    multi-ticker download, so a warm watchlist costs no upstream calls at all
+    and a cold one costs one call per distinct window rather than per symbol.
+    """
+    groups: dict[tuple, list[tuple]] = {}
+    gaps_by_pair = {}
+    for pair in dict.fromkeys(pairs):
+        gaps = _price_gaps(pair[0], pair[1], start, end)
+        CACHE_REQUESTS.inc('prices', 'miss' if gaps else 'hit')
+        if gaps:
+            gaps_by_pair[pair] = gaps
+            groups.setdefault((gaps[0][0], gaps[-1][1]), []).append(pair)
+    for (span_start, span_end), group in groups.items():
+        try:
+            frames = fetch_remote_many(group, span_start, span_end + timedelta(days=1))
+        except CircuitOpenError:
+            break  # yfinance is down: serve what is stored
+        for pair in group:
+            _store_fetched(pair[0], pair[1], frames[pair], gaps_by_pair[pair])
+    return {pair: _load_price_frame(pair[0], pair[1], start, end) for pair in dict.fromkeys(pairs)}
 
 # ---------------- Intraday (current day) support -----------------
 from zoneinfo import ZoneInfo
-import yfinance as yf
+yf = lazy_import("yfinance")
+from .quotes import QuoteCache
 
 _MARKET_TZ = {
     'US': 'America/New_York',
     'HK': 'Asia/Hong_Kong',
     'CN': 'Asia/Shanghai'
 }
+# regular close (local time), matching _session_status
+_MARKET_CLOSE = {
+    'US': time(16,0),
+    'HK': time(16,0),
+    'CN': time(15,0)
+}
 
 def _session_status(market: str):
     """Return ('pre'|'open'|'closed', today_date_in_tz). Very rough, ignores holidays."""
@@ -135,52 +279,67 @@ def _session_status(market: str):
         return 'closed', today
     return 'open', today
 
+def _live_price(symbol: str, market: str):
+    """yfinance fast_info / 1m history lookup; raises on upstream errors."""
+    yf_symbol = _market_symbol(symbol, market)
+    t = yf.Ticker(yf_symbol)
+    fast = getattr(t, 'fast_info', {}) or {}
+    # yfinance fast_info may be attribute-like or dict-like
+    def _fast_get(k):
+        if isinstance(fast, dict):
+            return fast.get(k)
+        return getattr(fast, k, None)
+    price = _fast_get('last_price') or _fast_get('lastPrice') or _fast_get('last_trade') or _fast_get('lastTrade')
+    day_open = _fast_get('open')
+    day_high = _fast_get('day_high') or _fast_get('dayHigh') or _fast_get('high')
+    day_low = _fast_get('day_low') or _fast_get('dayLow') or _fast_get('low')
+    vol = _fast_get('last_volume') or _fast_get('volume')
+    if price is None:
+        hist = t.history(period="1d", interval="1m")
+        if not hist.empty:
+            last_row = hist.tail(1).iloc[0]
+            price = float(last_row['Close'])
+            if day_open is None:
+                day_open = float(hist['Open'].iloc[0])
+            if day_high is None:
+                day_high = float(hist['High'].max())
+            if day_low is None:
+                day_low = float(hist['Low'].min())
+            if vol is None and 'Volume' in hist.columns:
+                vol = int(hist['Volume'].sum())
+    if price is None:
+        return None
+    # fallback fill
+    if day_open is None: day_open = price
+    if day_high is None: day_high = max(day_open, price)
+    if day_low is None: day_low = min(day_open, price)
+    if vol is None: vol = 0
+    return {
+        'open': float(day_open),
+        'high': float(day_high),
+        'low': float(day_low),
+        'close': float(price),
+        'volume': int(vol)
+    }
+
 def _fetch_live_price(symbol: str, market: str):
     """Fetch current (intraday) price using yfinance. Returns dict or None."""
     try:
-        yf_symbol = _market_symbol(symbol, market)
-        t = yf.Ticker(yf_symbol)
-        fast = getattr(t, 'fast_info', {}) or {}
-        # yfinance fast_info may be attribute-like or dict-like
-        def _fast_get(k):
-            if isinstance(fast, dict):
-                return fast.get(k)
-            return getattr(fast, k, None)
-        price = _fast_get('last_price') or _fast_get('lastPrice') or _fast_get('last_trade') or _fast_get('lastTrade')
-        day_open = _fast_get('open')
-        day_high = _fast_get('day_high') or _fast_get('dayHigh') or _fast_get('high')
-        day_low = _fast_get('day_low') or _fast_get('dayLow') or _fast_get('low')
-        vol = _fast_get('last_volume') or _fast_get('volume')
-        if price is None:
-            hist = t.history(period="1d", interval="1m")
-            if not hist.empty:
-                last_row = hist.tail(1).iloc[0]
-                price = float(last_row['Close'])
-                if day_open is None:
-                    day_open = float(hist['Open'].iloc[0])
-                if day_high is None:
-                    day_high = float(hist['High'].max())
-                if day_low is None:
-                    day_low = float(hist['Low'].min())
-                if vol is None and 'Volume' in hist.columns:
-                    vol = int(hist['Volume'].sum())
-        if price is None:
-            return None
-        # fallback fill
-        if day_open is None: day_open = price
-        if day_high is None: day_high = max(day_open, price)
-        if day_low is None: day_low = min(day_open, price)
-        if vol is None: vol = 0
-        return {
-            'open': float(day_open),
-            'high': float(day_high),
-            'low': float(day_low),
-            'close': float(price),
-            'volume': int(vol)
-        }
+        return YFINANCE.call_sync(_live_price, symbol, market)
     except Exception:
         return None
 
+_quote_cache = QuoteCache(_fetch_live_price)
+
+def get_live_quote(symbol: str, market: str):
+    """``_fetch_live_price`` through the in-process quote cache (see storage.quotes)."""
+    return _quote_cache.get(symbol, market)
+
+# after the close, how often a missing closing bar may be looked up again per symbol
+CLOSE_FILL_RETRY = float(os.getenv("CLOSE_FILL_RETRY_SECONDS", "600"))
+_close_fills: dict[tuple, tuple] = {}  # (symbol, market) -> (market date, monotonic time of the last lookup)
+
+@timed("maybe_update_intraday")
 def maybe_update_intraday(symbol: str, market: str):
     """Ensure today's row exists & updated.
 
@@ -189,22 +348,26 @@ def maybe_update_intraday(symbol: str, market: str):
     返回更新后的行或 None。
     """
     status, today = _session_status(market)
-    existing_rows = load_prices(symbol, market, today, today)
+    store = get_price_store()
+    existing_rows = store.load_rows(symbol, market, today, today)
 
     # 市场开市 -> 实时刷新
     if status == 'open':
-        live = _fetch_live_price(symbol, market)
+        live = get_live_quote(symbol, market)
         if not live:
             return None
         if existing_rows:
-            row = existing_rows[0]
+            before = existing_rows[0]
+            row = dict(before)
             row['high'] = float(max(row.get('high') or live['high'], live['high']))
             row['low'] = float(min(row.get('low') or live['low'], live['low']))
             row['close'] = float(live['close'])
             if not row.get('open'):
                 row['open'] = float(live['open'])
             row['volume'] = int(live.get('volume') or row.get('volume') or 0)
-            upsert_prices([row])
+            # 价格未变化时不重复写库
+            if row != before:
+                store.upsert_rows([row])
             return row
         new_row = {
             'symbol': symbol,
@@ -212,15 +375,25 @@ def maybe_update_intraday(symbol: str, market: str):
             'date': today,
             **live
         }
-        upsert_prices([new_row])
-    return new_row
+        store.upsert_rows([new_row])
+        return new_row
 
-    # 收盘后还没有当日行 -> 尝试用日线数据补
-    if status == 'closed' and not existing_rows:
+    # 收盘后还没有当日行 -> 尝试用日线数据补 (仅交易日, 每个 symbol 每 CLOSE_FILL_RETRY 秒最多一次)
+    if (status == 'closed' and not existing_rows and _is_trading_day(market, today)
+            and _last_closed_date(market) == today):
+        key = (symbol, market)
+        last_day, last_at = _close_fills.get(key, (None, 0.0))
+        if last_day == today and time_mod.monotonic() - last_at < CLOSE_FILL_RETRY:
+            return None
+        now = time_mod.monotonic()
+        if len(_close_fills) > 10_000:
+            for k in [k for k, (day, at) in _close_fills.items() if day != today or now - at >= CLOSE_FILL_RETRY]:
+                del _close_fills[k]
+        _close_fills[key] = (today, now)
         try:
             yf_symbol = _market_symbol(symbol, market)
             t = yf.Ticker(yf_symbol)
-            hist = t.history(period="2d")
+            hist = YFINANCE.call_sync(t.history, period="2d", timeout=YFINANCE.timeout())
             if not hist.empty:
                 last = hist.tail(1)
                 idx_date = last.index[-1].date()
@@ -236,7 +409,7 @@ def maybe_update_intraday(symbol: str, market: str):
                         'close': float(r.get('Close', r.get('close', 0) or 0)),
                         'volume': int(r.get('Volume', r.get('volume', 0) or 0)),
                     }
-                    upsert_prices([row])
+                    store.upsert_rows([row])
                     return row
         except Exception:
             return None
@@ -244,75 +417,126 @@ def maybe_update_intraday(symbol: str, market: str):
 
 
 # ---------------- News (recent, cached up to 10) -----------------
-def fetch_news(symbol: str, market: str) -> list[dict]:
-    """Best-effort recent news list with minimal fields. Prefer yfinance; fallback akshare if available.
-    Returns list of dicts: { 'published_at': datetime, 'text': str }
-    """
+# seconds a successful refresh is trusted before the feed is revalidated
+NEWS_TTL = float(os.getenv("NEWS_TTL_SECONDS", "900"))
+_news_refreshes: dict[tuple, asyncio.Future] = {}
+
+def _fetch_yf_news(symbol: str, market: str) -> list[dict]:
+    """yfinance ``Ticker.news`` headlines (blocking; upstream errors propagate)."""
     items: list[dict] = []
-    try:
-        yf_symbol = _market_symbol(symbol, market)
-        t = yf.Ticker(yf_symbol)
-        # yfinance 'news' field (list of dicts) sometimes available (EN headlines)
-        raw = getattr(t, 'news', []) or []
-        for n in raw[:20]:
-            ts = n.get('providerPublishTime') or n.get('published') or n.get('time')
-            import datetime as _dt
-            dt = None
+    yf_symbol = _market_symbol(symbol, market)
+    t = yf.Ticker(yf_symbol)
+    # yfinance 'news' field (list of dicts) sometimes available (EN headlines)
+    raw = getattr(t, 'news', []) or []
+    for n in raw[:20]:
+        ts = n.get('providerPublishTime') or n.get('published') or n.get('time')
+        import datetime as _dt
+        dt = None
+        try:
+            if isinstance(ts, (int, float)):
+                dt = _dt.datetime.utcfromtimestamp(int(ts))
+            else:
+                from pandas import to_datetime
+                dt = to_datetime(ts, utc=True).to_pydatetime()
+        except Exception:
+            continue
+        title = n.get('title') or n.get('content') or ''
+        if title:
+            items.append({'published_at': dt, 'text': str(title).strip()})
+    return items[:10]
+
+def _parse_rss(text: str) -> list[dict]:
+    """Headlines of a Yahoo Finance RSS document, de-duplicated by text, newest feed order."""
+    import xml.etree.ElementTree as ET
+    from email.utils import parsedate_to_datetime
+    items: list[dict] = []
+    root = ET.fromstring(text)
+    # Typical path: rss/channel/item
+    channel = root.find('channel')
+    if channel is not None:
+        for item in channel.findall('item'):
+            title = (item.findtext('title') or '').strip()
+            if not title:
+                continue
+            pub = item.findtext('pubDate')
             try:
-                if isinstance(ts, (int, float)):
-                    dt = _dt.datetime.utcfromtimestamp(int(ts))
-                else:
-                    from pandas import to_datetime
-                    dt = to_datetime(ts, utc=True).to_pydatetime()
+                dt = parsedate_to_datetime(pub) if pub else None
             except Exception:
-                continue
-            title = n.get('title') or n.get('content') or ''
-            if title:
-                items.append({'published_at': dt, 'text': str(title).strip()})
-        if items:
-            return items[:10]
-    except Exception:
-        pass
-    # Yahoo Finance RSS fallback (works for many tickers/regions)
+                dt = None
+            if dt is None:
+                dt = datetime.utcnow()
+            items.append({'published_at': dt, 'text': title})
+    # de-dup by text while preserving order
+    seen = set()
+    dedup = []
+    for it in items:
+        if it['text'] in seen:
+            continue
+        seen.add(it['text'])
+        dedup.append(it)
+    return dedup[:10]
+
+async def _fetch_rss_news(symbol: str, market: str, etag: str | None = None, last_modified: str | None = None):
+    """Conditional GET of the Yahoo Finance RSS feed.
+
+    Returns ``(items, etag, last_modified)``; ``items`` is None when the feed answered
+    304 Not Modified (nothing downloaded or parsed).
+    """
+    from .. import http_client
+    yf_symbol = _market_symbol(symbol, market)
+    region = {'US': 'US', 'HK': 'HK', 'CN': 'CN'}.get(market.upper(), 'US')
+    url = f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={yf_symbol}&region={region}&lang=en-US"
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    resp = await YAHOO_RSS.call(lambda timeout: http_client.get(url, timeout=timeout, headers=headers),
+                                retries=1, failure=http_failure)
+    if resp.status_code == 304:
+        return None, etag, last_modified
+    if resp.status_code != 200 or not resp.text:
+        return [], None, None
+    return _parse_rss(resp.text), resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+
+async def _refresh_news(symbol: str, market: str, force: bool) -> str:
+    state = await asyncio.to_thread(load_news_refresh, symbol, market)
+    now = datetime.utcnow()
+    if state and not force and (now - state['fetched_at']).total_seconds() < NEWS_TTL:
+        return 'fresh'
+    etag = state['etag'] if state else None
+    last_modified = state['last_modified'] if state else None
     try:
-        import httpx
-        from email.utils import parsedate_to_datetime
-        yf_symbol = _market_symbol(symbol, market)
-        region = {'US': 'US', 'HK': 'HK', 'CN': 'CN'}.get(market.upper(), 'US')
-        url = f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={yf_symbol}&region={region}&lang=en-US"
-        with httpx.Client(timeout=6.0, headers={"User-Agent": "stock-mcpilot/1.0"}) as client:
-            resp = client.get(url)
-            if resp.status_code == 200 and resp.text:
-                import xml.etree.ElementTree as ET
-                root = ET.fromstring(resp.text)
-                # Typical path: rss/channel/item
-                channel = root.find('channel')
-                if channel is not None:
-                    for item in channel.findall('item'):
-                        title = (item.findtext('title') or '').strip()
-                        if not title:
-                            continue
-                        pub = item.findtext('pubDate')
-                        try:
-                            dt = parsedate_to_datetime(pub) if pub else None
-                        except Exception:
-                            dt = None
-                        if dt is None:
-                            from datetime import datetime as _dt
-                            dt = _dt.utcnow()
-                        items.append({'published_at': dt, 'text': title})
-                if items:
-                    # de-dup by text while preserving order
-                    seen = set()
-                    dedup = []
-                    for it in items:
-                        if it['text'] in seen:
-                            continue
-                        seen.add(it['text'])
-                        dedup.append(it)
-                    return dedup[:10]
+        items, etag, last_modified = await _fetch_rss_news(symbol, market, etag, last_modified)
     except Exception:
-        pass
-    # Optional: akshare fallback (TBD for specific markets)
-    return items[:10]
+        items, etag, last_modified = [], None, None  # includes CircuitOpenError
+    if items is None:
+        await asyncio.to_thread(put_news_refresh, symbol, market, now, etag, last_modified)
+        return 'not_modified'
+    if not items:
+        # feed unavailable or empty: yfinance ``Ticker.news``
+        try:
+            items = await YFINANCE.call(lambda timeout: asyncio.to_thread(_fetch_yf_news, symbol, market))
+        except Exception:
+            return 'failed'
+    if items:
+        await asyncio.to_thread(add_news_items, symbol, market, items)
+    await asyncio.to_thread(put_news_refresh, symbol, market, now, etag, last_modified)
+    return 'updated'
 
+async def refresh_news(symbol: str, market: str, force: bool = False) -> str:
+    """Bring the stored headlines (``load_news``) up to date.
+
+    Nothing is fetched within ``NEWS_TTL`` of the last refresh. After that the RSS feed
+    is revalidated with If-None-Match / If-Modified-Since, so an unchanged feed costs
+    one 304; yfinance is the fallback when the feed fails or is empty. Concurrent
+    calls for one symbol share a single refresh. Returns ``'fresh'``, ``'not_modified'``,
+    ``'updated'`` or ``'failed'`` (stored headlines are left as they were).
+    """
+    key = (symbol, market)
+    task = _news_refreshes.get(key)
+    if task is None:
+        task = _news_refreshes[key] = asyncio.ensure_future(_refresh_news(symbol, market, force))
+        task.add_done_callback(lambda _: _news_refreshes.pop(key, None))
+    # shielded: a disconnecting client must not cancel the refresh other requests wait on
+    return await asyncio.shield(task)
@@ -1,8 +1,40 @@
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Date, Float, Integer, select, Text, DateTime, func, and_
+from sqlalchemy import create_engine, event, MetaData, Table, Column, Index, String, Date, Float, Integer, select, Text, DateTime, func, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime
 import os
+from ..metrics import DB_ROWS
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./backend/storage/stock_cache.db")
-engine = create_engine(DATABASE_URL, future=True)
+# SQLite profile: WAL lets readers run alongside the single writer; synchronous=NORMAL
+# is durable across application crashes in WAL mode (only an OS crash may lose the last commits)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# burst connections above the pool; sized for the 40-thread request threadpool so a writer never waits behind readers
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+
+def _make_engine(url: str):
+    if not url.startswith("sqlite"):
+        return create_engine(url, future=True, pool_pre_ping=True)
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return create_engine(url, future=True)
+    # one connection per concurrent reader (threadpool / to_thread); connections are shared across threads
+    eng = create_engine(url, future=True, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT})
+
+    @event.listens_for(eng, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+    return eng
+
+engine = _make_engine(DATABASE_URL)
 metadata = MetaData()
 
 prices = Table(
@@ -16,6 +48,8 @@ prices = Table(
     Column("low", Float),
     Column("close", Float),
     Column("volume", Integer),
+    # covering index for load_prices: the range scan never touches the table b-tree
+    Index("ix_prices_covering", "symbol", "market", "date", "open", "high", "low", "close", "volume"),
 )
 
 news = Table(
@@ -25,21 +59,190 @@ news = Table(
     Column("market", String, primary_key=True),
     Column("published_at", DateTime, primary_key=True),
     Column("text", Text, nullable=False),
+    # covering index for load_news (latest 10 per symbol) and the prune in add_news_items
+    Index("ix_news_covering", "symbol", "market", "published_at", "text"),
+)
+
+# OHLCV aggregated per period (weekly, monthly, N-day; see storage.rollups), kept up
+# to date from the daily bars on every price write. period_start is the bucket key;
+# first_date / last_date / bars describe which daily bars it currently holds.
+price_rollups = Table(
+    "price_rollups",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("market", String, primary_key=True),
+    Column("interval", String, primary_key=True),
+    Column("period_start", Date, primary_key=True),
+    Column("open", Float),
+    Column("high", Float),
+    Column("low", Float),
+    Column("close", Float),
+    Column("volume", Integer),
+    Column("first_date", Date, nullable=False),
+    Column("last_date", Date, nullable=False),
+    Column("bars", Integer, nullable=False),
+)
+
+# Which interval set the rollups of a symbol were fully built for; a symbol missing
+# here (history stored before rollups existed, or new intervals configured) is rebuilt.
+rollup_builds = Table(
+    "rollup_builds",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("market", String, primary_key=True),
+    Column("intervals", String, nullable=False),
+    Column("built_at", DateTime, nullable=False),
+)
+
+# Last news refresh per (symbol, market) plus the RSS feed's HTTP validators, so
+# refreshes are skipped within the TTL and revalidated with a conditional GET after it.
+news_refresh = Table(
+    "news_refresh",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("market", String, primary_key=True),
+    Column("fetched_at", DateTime, nullable=False),
+    Column("etag", String),
+    Column("last_modified", String),
 )
 
-metadata.create_all(engine)
+# Per-symbol metadata resolved from yfinance once and shared by every worker / restart
+# (see storage.symbols). name_* / currency may be NULL when the upstream had none.
+symbol_meta = Table(
+    "symbol_meta",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("market", String, primary_key=True),
+    Column("yf_symbol", String, nullable=False),
+    Column("suffix", String, nullable=False),
+    Column("name_en", String),
+    Column("name_zh", String),
+    Column("currency", String),
+    Column("refreshed_at", DateTime, nullable=False),
+)
+
+# Calendar date ranges [start, end] already fetched from upstream per (symbol, market).
+# Only closed history is recorded, so a covered range never needs re-downloading.
+price_coverage = Table(
+    "price_coverage",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("market", String, primary_key=True),
+    Column("start", Date, primary_key=True),
+    Column("end", Date, nullable=False),
+)
+
+# Next earnings date per symbol of the calendar universe. Symbols checked without a
+# known upcoming date are kept with earnings_date NULL so refresh freshness is tracked.
+earnings_calendar = Table(
+    "earnings_calendar",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("market", String, primary_key=True),
+    Column("earnings_date", Date),
+    Column("name", String),
+    Column("session", String),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_earnings_calendar_market_date", "market", "earnings_date"),
+)
+
+# LLM responses keyed by sha256(provider, model, language, prompt). The prompt embeds the
+# price summary, so new price data yields a new key; stale entries age out via LRU.
+llm_cache = Table(
+    "llm_cache",
+    metadata,
+    Column("key", String, primary_key=True),
+    Column("provider", String, nullable=False),
+    Column("model", String),
+    Column("language", String),
+    Column("response", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("last_used_at", DateTime, nullable=False),
+    Index("ix_llm_cache_last_used_at", "last_used_at"),
+)
+
+def init_schema():
+    """Create missing tables and indexes (idempotent; run from the app lifespan, not at import)."""
+    metadata.create_all(engine)
+    # create_all skips indexes of tables that already exist: add ones introduced later
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+def _dialect_insert():
+    """Return the dialect-specific insert() supporting ON CONFLICT, or None."""
+    name = engine.dialect.name
+    if name == 'sqlite':
+        return sqlite.insert
+    if name == 'postgresql':
+        return postgresql.insert
+    return None
+
+def _upsert(table: Table, rows: list[dict], update_cols):
+    """Set-based upsert on the table's primary key (executemany)."""
+    DB_ROWS.inc(table.name, 'write', amount=len(rows))
+    dialect_insert = _dialect_insert()
+    key_cols = [c for c in table.primary_key.columns]
+    with engine.begin() as conn:
+        if dialect_insert is None:
+            for r in rows:
+                conn.execute(table.delete().where(and_(*[c==r[c.name] for c in key_cols])))
+            conn.execute(table.insert(), rows)
+            return
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_cols,
+            set_={k: stmt.excluded[k] for k in update_cols},
+        )
+        conn.execute(stmt, rows)
 
 def upsert_prices(rows):
+    """Insert or update price rows (list of dicts) in one set-based statement.
+
+    SQLite / Postgres use ``INSERT ... ON CONFLICT (symbol, market, date) DO UPDATE``
+    executed as a single executemany; other dialects fall back to delete + insert.
+    """
     if not rows:
         return
-    with engine.begin() as conn:
-        for r in rows:
-            conn.execute(prices.delete().where(
-                (prices.c.symbol==r['symbol']) &
-                (prices.c.market==r['market']) &
-                (prices.c.date==r['date'])
-            ))
-            conn.execute(prices.insert().values(**r))
+    _upsert(prices, rows, PRICE_FIELDS)
+
+def price_rows_from_columns(symbol: str, market: str, dates, columns: dict) -> list[dict]:
+    """Build upsert parameter rows from column arrays (no per-row DataFrame access).
+
+    ``dates`` is a sequence of ``datetime.date``; ``columns`` maps field name -> array.
+    Missing fields default to 0 like the previous row-by-row conversion.
+    """
+    n = len(dates)
+    cols = []
+    for k in PRICE_FIELDS:
+        vals = columns.get(k)
+        if vals is None:
+            vals = [0] * n
+        elif k == 'volume':
+            vals = [int(v) if v == v else 0 for v in vals]  # NaN -> 0
+        else:
+            vals = list(map(float, vals))
+        cols.append(vals)
+    return [
+        {'symbol': symbol, 'market': market, 'date': d,
+         'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+        for d, o, h, l, c, v in zip(dates, *cols)
+    ]
+
+def upsert_price_frame(symbol: str, market: str, df) -> int:
+    """Bulk upsert a DatetimeIndex-ed OHLCV DataFrame (as returned by ``fetch_remote``).
+
+    Returns the number of rows written.
+    """
+    if df is None or df.empty:
+        return 0
+    dates = df.index.date
+    columns = {k: df[k].tolist() for k in PRICE_FIELDS if k in df.columns}
+    rows = price_rows_from_columns(symbol, market, dates, columns)
+    upsert_prices(rows)
+    return len(rows)
 
 def load_prices(symbol: str, market: str, start, end):
     with engine.begin() as conn:
@@ -50,28 +253,178 @@ def load_prices(symbol: str, market: str, start, end):
             (prices.c.date<=end)
         )
         rows = conn.execute(stmt).fetchall()
+        DB_ROWS.inc('prices', 'read', amount=len(rows))
         return [dict(r._mapping) for r in rows]
 
+def price_symbols() -> list[tuple]:
+    """All (symbol, market) pairs present in the prices table."""
+    with engine.begin() as conn:
+        stmt = select(prices.c.symbol, prices.c.market).distinct().order_by(prices.c.market, prices.c.symbol)
+        return [(r[0], r[1]) for r in conn.execute(stmt).fetchall()]
+
+def load_coverage(symbol: str, market: str) -> list[tuple]:
+    """Return the merged, sorted list of covered (start, end) date ranges."""
+    with engine.begin() as conn:
+        stmt = select(price_coverage.c.start, price_coverage.c.end).where(
+            (price_coverage.c.symbol==symbol) & (price_coverage.c.market==market)
+        ).order_by(price_coverage.c.start)
+        return [(r[0], r[1]) for r in conn.execute(stmt).fetchall()]
+
+def add_coverage(symbol: str, market: str, start, end):
+    """Record [start, end] as fetched, merging with overlapping/adjacent ranges."""
+    if start > end:
+        return
+    with engine.begin() as conn:
+        where = (price_coverage.c.symbol==symbol) & (price_coverage.c.market==market)
+        ranges = [(r[0], r[1]) for r in conn.execute(select(price_coverage.c.start, price_coverage.c.end).where(where)).fetchall()]
+        ranges.append((start, end))
+        ranges.sort()
+        merged = [ranges[0]]
+        for s, e in ranges[1:]:
+            ls, le = merged[-1]
+            if (s - le).days <= 1:
+                merged[-1] = (ls, max(le, e))
+            else:
+                merged.append((s, e))
+        conn.execute(price_coverage.delete().where(where))
+        conn.execute(price_coverage.insert(), [
+            {'symbol': symbol, 'market': market, 'start': s, 'end': e} for s, e in merged
+        ])
+
+NEWS_KEEP = 10
+
 def add_news_items(symbol: str, market: str, items: list[dict]):
+    """Insert headlines (duplicates on the primary key are ignored) and keep the latest ``NEWS_KEEP``."""
     if not items:
         return
+    DB_ROWS.inc('news', 'write', amount=len(items))
+    rows = [{'symbol': symbol, 'market': market, 'published_at': it['published_at'], 'text': it['text']} for it in items]
+    where = (news.c.symbol==symbol) & (news.c.market==market)
+    dialect_insert = _dialect_insert()
     with engine.begin() as conn:
-        # insert or ignore duplicates on primary key
-        for it in items:
-            try:
-                conn.execute(news.insert().values(symbol=symbol, market=market, published_at=it['published_at'], text=it['text']))
-            except Exception:
-                # duplicate -> ignore
-                pass
-        # keep only latest 10 by published_at
-        stmt = select(news.c.published_at).where((news.c.symbol==symbol) & (news.c.market==market)).order_by(news.c.published_at.desc())
-        all_ts = [r[0] for r in conn.execute(stmt).fetchall()]
-        if len(all_ts) > 10:
-            cutoff = all_ts[10-1]  # keep index 0..9
-            conn.execute(news.delete().where((news.c.symbol==symbol) & (news.c.market==market) & (news.c.published_at < cutoff)))
+        if dialect_insert is not None:
+            conn.execute(dialect_insert(news).on_conflict_do_nothing(), rows)
+        else:
+            existing = {r[0] for r in conn.execute(select(news.c.published_at).where(where)).fetchall()}
+            rows = [r for r in rows if r['published_at'] not in existing]
+            if rows:
+                conn.execute(news.insert(), list({r['published_at']: r for r in rows}.values()))
+        # one DELETE: everything older than the NEWS_KEEP-th newest headline (NULL -> nothing to prune)
+        cutoff = select(news.c.published_at).where(where).order_by(news.c.published_at.desc()) \
+            .offset(NEWS_KEEP - 1).limit(1).scalar_subquery()
+        conn.execute(news.delete().where(where & (news.c.published_at < cutoff)))
 
 def load_news(symbol: str, market: str) -> list[dict]:
     with engine.begin() as conn:
-        stmt = select(news).where((news.c.symbol==symbol) & (news.c.market==market)).order_by(news.c.published_at.desc()).limit(10)
+        stmt = select(news).where((news.c.symbol==symbol) & (news.c.market==market)).order_by(news.c.published_at.desc()).limit(NEWS_KEEP)
+        rows = conn.execute(stmt).fetchall()
+        DB_ROWS.inc('news', 'read', amount=len(rows))
+        return [dict(r._mapping) for r in rows]
+
+ROLLUP_FIELDS = PRICE_FIELDS + ('first_date', 'last_date', 'bars')
+
+def upsert_rollups(rows: list[dict]):
+    if not rows:
+        return
+    _upsert(price_rollups, rows, ROLLUP_FIELDS)
+
+def load_rollups(symbol: str, market: str, interval: str, start, end) -> list[dict]:
+    """Periods of ``interval`` holding any bar in [start, end], oldest first (primary key range scan)."""
+    with engine.begin() as conn:
+        stmt = select(price_rollups).where(
+            (price_rollups.c.symbol==symbol) &
+            (price_rollups.c.market==market) &
+            (price_rollups.c.interval==interval) &
+            (price_rollups.c.period_start<=end) &
+            (price_rollups.c.last_date>=start)
+        ).order_by(price_rollups.c.period_start)
+        rows = conn.execute(stmt).fetchall()
+        DB_ROWS.inc('price_rollups', 'read', amount=len(rows))
+        return [dict(r._mapping) for r in rows]
+
+def rollups_built_for(symbol: str, market: str) -> str | None:
+    with engine.begin() as conn:
+        return conn.execute(select(rollup_builds.c.intervals).where(
+            (rollup_builds.c.symbol==symbol) & (rollup_builds.c.market==market)
+        )).scalar()
+
+def mark_rollups_built(symbol: str, market: str, intervals: str):
+    _upsert(rollup_builds, [{'symbol': symbol, 'market': market, 'intervals': intervals,
+                             'built_at': datetime.utcnow()}], ('intervals', 'built_at'))
+
+def load_news_refresh(symbol: str, market: str) -> dict | None:
+    with engine.begin() as conn:
+        row = conn.execute(select(news_refresh).where(
+            (news_refresh.c.symbol==symbol) & (news_refresh.c.market==market)
+        )).first()
+        return dict(row._mapping) if row is not None else None
+
+def put_news_refresh(symbol: str, market: str, fetched_at, etag: str | None = None, last_modified: str | None = None):
+    _upsert(news_refresh, [{'symbol': symbol, 'market': market, 'fetched_at': fetched_at,
+                            'etag': etag, 'last_modified': last_modified}],
+            ('fetched_at', 'etag', 'last_modified'))
+
+def load_symbol_meta(pairs: list[tuple]) -> dict[tuple, dict]:
+    """Stored metadata for the given (symbol, market) pairs in one query; absent pairs are omitted."""
+    if not pairs:
+        return {}
+    symbols = {p[0] for p in pairs}
+    wanted = set(pairs)
+    with engine.begin() as conn:
+        rows = conn.execute(select(symbol_meta).where(symbol_meta.c.symbol.in_(symbols))).fetchall()
+    out = {}
+    for r in rows:
+        m = dict(r._mapping)
+        if (m['symbol'], m['market']) in wanted:
+            out[(m['symbol'], m['market'])] = m
+    DB_ROWS.inc('symbol_meta', 'read', amount=len(out))
+    return out
+
+def upsert_symbol_meta(rows: list[dict]):
+    if not rows:
+        return
+    _upsert(symbol_meta, rows, ('yf_symbol', 'suffix', 'name_en', 'name_zh', 'currency', 'refreshed_at'))
+
+def upsert_earnings(rows: list[dict]):
+    if not rows:
+        return
+    _upsert(earnings_calendar, rows, ('earnings_date', 'name', 'session', 'updated_at'))
+
+def load_upcoming_earnings(market: str, start, end, limit: int) -> list[dict]:
+    """Earnings in [start, end] ordered by date (served from ix_earnings_calendar_market_date)."""
+    with engine.begin() as conn:
+        stmt = select(earnings_calendar).where(
+            (earnings_calendar.c.market==market) &
+            (earnings_calendar.c.earnings_date>=start) &
+            (earnings_calendar.c.earnings_date<=end)
+        ).order_by(earnings_calendar.c.earnings_date, earnings_calendar.c.symbol).limit(limit)
         rows = conn.execute(stmt).fetchall()
+        DB_ROWS.inc('earnings_calendar', 'read', amount=len(rows))
         return [dict(r._mapping) for r in rows]
+
+def earnings_refreshed_at(market: str):
+    """Time of the latest calendar refresh for the market, or None if never refreshed."""
+    with engine.begin() as conn:
+        stmt = select(func.max(earnings_calendar.c.updated_at)).where(earnings_calendar.c.market==market)
+        return conn.execute(stmt).scalar()
+
+def get_llm_response(key: str, min_created_at) -> str | None:
+    """Cached response for ``key`` created after ``min_created_at``; touches last_used_at."""
+    with engine.begin() as conn:
+        row = conn.execute(select(llm_cache.c.response).where(
+            (llm_cache.c.key==key) & (llm_cache.c.created_at>=min_created_at)
+        )).first()
+        if row is None:
+            return None
+        DB_ROWS.inc('llm_cache', 'read')
+        conn.execute(llm_cache.update().where(llm_cache.c.key==key).values(last_used_at=datetime.utcnow()))
+        return row[0]
+
+def put_llm_response(row: dict, max_entries: int):
+    """Store a response and evict least-recently-used entries beyond ``max_entries``."""
+    now = datetime.utcnow()
+    _upsert(llm_cache, [{**row, 'created_at': now, 'last_used_at': now}],
+            ('provider', 'model', 'language', 'response', 'created_at', 'last_used_at'))
+    with engine.begin() as conn:
+        keep = select(llm_cache.c.key).order_by(llm_cache.c.last_used_at.desc()).limit(max_entries)
+        conn.execute(llm_cache.delete().where(llm_cache.c.key.not_in(keep.scalar_subquery())))
@@ -0,0 +1,157 @@
+"""Upcoming-earnings calendar: concurrent refresh into SQLite, served by date range.
+
+The calendar universe is refreshed with a bounded thread pool (yfinance is blocking)
+and stored in the ``earnings_calendar`` table. Requests read it back with one indexed
+range query and only trigger a refresh once the stored snapshot is older than the TTL.
+
+A symbol whose lookup failed keeps its stored row. A refresh in which most lookups
+failed does not count as fresh: it is retried after ``EARNINGS_RETRY_SECONDS``.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from .db import upsert_earnings, load_upcoming_earnings, earnings_refreshed_at
+from .symbols import resolve_many
+from ..resilience import YFINANCE
+
+EARNINGS_TTL = timedelta(hours=float(os.getenv("EARNINGS_TTL_HOURS", "12")))
+EARNINGS_WORKERS = int(os.getenv("EARNINGS_WORKERS", "8"))
+EARNINGS_RETRY = float(os.getenv("EARNINGS_RETRY_SECONDS", "300"))
+# Look-ahead stored per refresh; covers the largest `days` the endpoint accepts.
+HORIZON_DAYS = 60
+
+# Representative symbol universe (top weights of S&P/Nasdaq + a few others).
+# HK/CN: not implemented yet (akshare integration could be added later).
+UNIVERSE = {
+    'US': [
+        'AAPL','MSFT','AMZN','GOOGL','META','NVDA','TSLA','ORCL','INTC','NFLX','CRM','AMD','QCOM','CSCO','ADBE','PYPL','PEP','COST','AVGO','TXN',
+        'JPM','BAC','WFC','V','MA','KO','PFE','ABBV','MRK','XOM','CVX','UNH','HD','WMT','DIS','NKE','LIN','TMO','ABNB','SNOW','SHOP'
+    ],
+}
+
+_refresh_lock = threading.Lock()
+_retry_after: dict[str, float] = {}  # market -> monotonic time of the next attempt after a failed refresh
+_FAILED = object()  # lookup failed (upstream error / open circuit), unlike None = no upcoming date
+
+def _next_earnings(sym: str, today: date, end_date: date) -> dict | None:
+    """Look up the first earnings date in [today, end_date] for one symbol (blocking).
+
+    Returns None only when no earnings are scheduled in the window; upstream errors
+    propagate so ``refresh_calendar`` can keep the stored row.
+    """
+    import yfinance as yf, pandas as pd
+    t = yf.Ticker(sym)
+    # Try get_earnings_dates first for forward dates
+    earns_df = None
+    if hasattr(t, 'get_earnings_dates'):
+        earns_df = t.get_earnings_dates(limit=12)
+    future_date = None
+    if earns_df is not None and not earns_df.empty:
+        # index holds dates; pick the first date >= today within window
+        for idx in sorted(earns_df.index):
+            try:
+                d = idx.date() if hasattr(idx, 'date') else pd.to_datetime(idx).date()
+                if d >= today and d <= end_date:
+                    future_date = d
+                    break
+            except Exception:
+                continue
+    # Fallback to calendar
+    if future_date is None:
+        cal = None
+        error = None
+        for attr in ['get_calendar','calendar']:
+            v = getattr(t, attr, None)
+            try:
+                cal = v() if callable(v) else v
+                if cal is not None and hasattr(cal,'empty') and not cal.empty:
+                    break
+            except Exception as e:
+                error = e
+                continue
+        if cal is None and error is not None:
+            raise error  # both calendar lookups failed: unknown, not "no date"
+        if cal is not None and hasattr(cal,'to_dict'):
+            dct = cal.to_dict()
+            flat_vals = []
+            for k, vs in dct.items():
+                if isinstance(vs, dict):
+                    vs = list(vs.values())
+                for v in (vs or []):
+                    flat_vals.append(v)
+            for v in flat_vals:
+                try:
+                    ts = pd.to_datetime(v, errors='coerce')
+                    if ts is not None and ts is not pd.NaT:
+                        dd = ts.date()
+                        if dd >= today and dd <= end_date:
+                            future_date = dd
+                            break
+                except Exception:
+                    continue
+    if not future_date:
+        return None
+    # name is filled in from storage.symbols for the whole universe at once
+    return {'earnings_date': future_date, 'name': None, 'session': None}
+
+def refresh_calendar(market: str) -> int:
+    """Re-query the market's universe concurrently and store the results.
+
+    Returns the number of symbols with an upcoming earnings date.
+    """
+    symbols = UNIVERSE.get(market, [])
+    if not symbols:
+        return 0
+    today = datetime.utcnow().date()
+    end_date = today + timedelta(days=HORIZON_DAYS)
+
+    def _lookup(sym):
+        try:
+            return YFINANCE.call_sync(_next_earnings, sym, today, end_date)
+        except Exception:
+            return _FAILED
+
+    with ThreadPoolExecutor(max_workers=EARNINGS_WORKERS) as pool:
+        found = list(pool.map(_lookup, symbols))
+    ok = [(sym, res) for sym, res in zip(symbols, found) if res is not _FAILED]
+    metas = resolve_many([(sym, market) for sym, res in ok if res])
+    failed = len(symbols) - len(ok)
+    if failed * 2 > len(symbols):
+        # keep the snapshot stale: successful rows are written without moving updated_at forward
+        now = earnings_refreshed_at(market) or datetime(1970, 1, 1)
+        _retry_after[market] = time.monotonic() + EARNINGS_RETRY
+    else:
+        now = datetime.utcnow()
+        _retry_after.pop(market, None)
+    rows = []
+    for sym, res in ok:
+        res = res or {'earnings_date': None, 'name': None, 'session': None}
+        if res['earnings_date'] is not None:
+            res['name'] = metas[(sym, market)]['name_en']
+        rows.append({'symbol': sym, 'market': market, 'updated_at': now, **res})
+    upsert_earnings(rows)
+    return sum(1 for _, r in ok if r)
+
+def ensure_fresh(market: str):
+    """Refresh the calendar if the stored snapshot is missing or older than the TTL."""
+    if not UNIVERSE.get(market):
+        return
+    refreshed = earnings_refreshed_at(market)
+    if refreshed is not None and datetime.utcnow() - refreshed < EARNINGS_TTL:
+        return
+    if time.monotonic() < _retry_after.get(market, 0.0):
+        return  # the last refresh mostly failed: serve what is stored until the retry delay
+    with _refresh_lock:
+        # another request may have refreshed while we waited
+        refreshed = earnings_refreshed_at(market)
+        if refreshed is not None and datetime.utcnow() - refreshed < EARNINGS_TTL:
+            return
+        refresh_calendar(market)
+
+def upcoming_earnings(market: str, days: int, limit: int) -> list[dict]:
+    ensure_fresh(market)
+    today = datetime.utcnow().date()
+    return load_upcoming_earnings(market, today, today + timedelta(days=days), limit)
@@ -0,0 +1,37 @@
+"""Persistent LLM response cache (SQLite ``llm_cache`` table).
+
+Entries are keyed by a hash of (provider, model, language, prompt). Because the
+analysis prompt embeds the price summary, a change in the underlying price data
+produces a different key, which ends the old entry's useful life; it is then
+evicted by the size-bounded LRU. ``LLM_CACHE_TTL_HOURS`` is a hard upper bound.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from .db import get_llm_response, put_llm_response
+from ..metrics import CACHE_REQUESTS
+
+LLM_CACHE_TTL = timedelta(hours=float(os.getenv("LLM_CACHE_TTL_HOURS", "24")))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+def cache_key(provider: str, model: str | None, language: str, prompt: str) -> str:
+    raw = "\x1f".join([provider, model or "", language, prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def lookup(key: str) -> str | None:
+    try:
+        response = get_llm_response(key, datetime.utcnow() - LLM_CACHE_TTL)
+    except Exception:
+        response = None
+    CACHE_REQUESTS.inc('llm', 'miss' if response is None else 'hit')
+    return response
+
+def store(key: str, provider: str, model: str | None, language: str, response: str):
+    if not response:
+        return
+    try:
+        put_llm_response({'key': key, 'provider': provider, 'model': model, 'language': language,
+                          'response': response}, LLM_CACHE_MAX_ENTRIES)
+    except Exception:
+        pass  # cache is best-effort
@@ -0,0 +1,36 @@
+"""Copy the SQLite ``prices`` table into a columnar price store.
+
+Usage (from the repository root):
+    python -m backend.storage.migrate_prices --to parquet [--path ./backend/storage/prices]
+
+After migrating, set ``PRICE_STORE`` (and ``PRICE_STORE_PATH`` if changed) to use it.
+The SQLite table is left untouched, so switching back needs no migration.
+"""
+import argparse
+from datetime import date
+
+from .price_store import PRICE_STORE_PATH, SQLitePriceStore, make_price_store
+
+def migrate(kind: str, root: str = PRICE_STORE_PATH) -> tuple[int, int]:
+    """Copy every (symbol, market) series; returns (symbols, rows) copied."""
+    src = SQLitePriceStore()
+    dst = make_price_store(kind, root)
+    n_symbols = n_rows = 0
+    for symbol, market in src.symbols():
+        df = src.load_frame(symbol, market, date.min, date.max)
+        if df.empty:
+            continue
+        n_rows += dst.upsert_frame(symbol, market, df)
+        n_symbols += 1
+    return n_symbols, n_rows
+
+def main():
+    ap = argparse.ArgumentParser(description="Copy SQLite prices into a columnar price store.")
+    ap.add_argument("--to", choices=["parquet", "arrow"], required=True)
+    ap.add_argument("--path", default=PRICE_STORE_PATH)
+    args = ap.parse_args()
+    n_symbols, n_rows = migrate(args.to, args.path)
+    print(f"migrated {n_rows} rows for {n_symbols} symbols to {args.to} store at {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Pluggable daily price storage.
+
+``get_price_store()`` returns the backend selected by ``PRICE_STORE``:
+
+- ``sqlite`` (default): the ``prices`` table in ``storage.db``.
+- ``parquet``: one Parquet file per (market, symbol) under ``PRICE_STORE_PATH``,
+  written in small row groups so date-range reads skip non-matching groups.
+- ``arrow``: one Arrow IPC file per (market, symbol), memory-mapped on read.
+
+The columnar backends need ``pyarrow`` (``pip install pyarrow``). Fetch coverage
+and all other metadata stay in SQLite regardless of the backend.
+
+Every write also refreshes the weekly / monthly rollups of the periods it touched
+(``storage.rollups``), whichever backend holds the daily bars.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from . import db, rollups
+from ..lazy import lazy_import
+from ..metrics import DB_ROWS
+
+pd = lazy_import("pandas")
+
+PRICE_STORE = os.getenv("PRICE_STORE", "sqlite").lower()
+PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", "./backend/storage/prices")
+COLUMNS = ('symbol', 'market', 'date') + db.PRICE_FIELDS
+
+class PriceStore(ABC):
+    """Daily OHLCV bars keyed by (symbol, market, date)."""
+
+    @abstractmethod
+    def load_rows(self, symbol: str, market: str, start: date, end: date) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def upsert_rows(self, rows: list[dict]):
+        ...
+
+    def load_frame(self, symbol: str, market: str, start: date, end: date) -> pd.DataFrame:
+        """Bars in [start, end] as a DataFrame indexed (and sorted) by date; empty if none."""
+        rows = self.load_rows(symbol, market, start, end)
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows)
+        df.set_index(pd.to_datetime(df['date']), inplace=True)
+        return df.sort_index()
+
+    def upsert_frame(self, symbol: str, market: str, df: pd.DataFrame) -> int:
+        """Write a DatetimeIndex-ed OHLCV frame (as returned by ``fetch_remote``)."""
+        if df is None or df.empty:
+            return 0
+        columns = {k: df[k].tolist() for k in db.PRICE_FIELDS if k in df.columns}
+        rows = db.price_rows_from_columns(symbol, market, df.index.date, columns)
+        self.upsert_rows(rows)
+        return len(rows)
+
+    def symbols(self) -> list[tuple]:
+        """All stored (symbol, market) pairs."""
+        return []
+
+    def _written(self, rows: list[dict]):
+        """Bring the rollups of the periods touched by ``rows`` up to date."""
+        touched: dict[tuple, set] = {}
+        for r in rows:
+            touched.setdefault((r['symbol'], r['market']), set()).add(r['date'])
+        for (symbol, market), dates in touched.items():
+            rollups.safe_update(self, symbol, market, dates)
+
+class SQLitePriceStore(PriceStore):
+    def load_rows(self, symbol, market, start, end):
+        return db.load_prices(symbol, market, start, end)
+
+    def upsert_rows(self, rows):
+        db.upsert_prices(rows)
+        self._written(rows)
+
+    def upsert_frame(self, symbol, market, df):
+        n = db.upsert_price_frame(symbol, market, df)
+        if n:
+            rollups.safe_update(self, symbol, market, set(df.index.date))
+        return n
+
+    def symbols(self):
+        return db.price_symbols()
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive OS lock on ``path`` (created if missing), shared by all worker processes."""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class _ColumnarPriceStore(PriceStore):
+    """Per-symbol columnar files; upserts rewrite the symbol's (small) file atomically.
+
+    The read-merge-rewrite holds a thread lock and an OS lock on ``<file>.lock``, so
+    concurrent writers in other worker processes cannot lose each other's rows.
+    """
+
+    name = ""
+    suffix = ""
+
+    def __init__(self, root: str = PRICE_STORE_PATH):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError(f"PRICE_STORE={self.name} requires pyarrow (pip install pyarrow)") from e
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str, market: str) -> str:
+        return os.path.join(self.root, market, f"{symbol}{self.suffix}")
+
+    @staticmethod
+    def _schema():
+        import pyarrow as pa
+        return pa.schema([
+            ('symbol', pa.string()), ('market', pa.string()), ('date', pa.date32()),
+            ('open', pa.float64()), ('high', pa.float64()), ('low', pa.float64()),
+            ('close', pa.float64()), ('volume', pa.int64()),
+        ])
+
+    @abstractmethod
+    def _read(self, path: str, start: date | None, end: date | None):
+        """Return a pyarrow.Table restricted to [start, end] (None = unbounded)."""
+
+    @abstractmethod
+    def _write(self, path: str, table):
+        ...
+
+    def load_rows(self, symbol, market, start, end):
+        return self.load_frame(symbol, market, start, end).to_dict(orient='records')
+
+    def load_frame(self, symbol, market, start, end):
+        path = self._path(symbol, market)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = self._read(path, start, end).to_pandas()
+        DB_ROWS.inc('prices', 'read', amount=len(df))
+        if df.empty:
+            return pd.DataFrame()
+        df.set_index(pd.to_datetime(df['date']), inplace=True)
+        return df.sort_index()
+
+    def _merge_write(self, symbol: str, market: str, new):
+        import pyarrow as pa
+        DB_ROWS.inc('prices', 'write', amount=len(new))
+        path = self._path(symbol, market)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, _file_lock(f"{path}.lock"):
+            if os.path.exists(path):
+                old = self._read(path, None, None).to_pandas()
+                merged = pd.concat([old, new], ignore_index=True)
+                merged = merged.drop_duplicates(subset=['date'], keep='last')
+            else:
+                merged = new
+            merged = merged.sort_values('date', kind='stable')
+            table = pa.Table.from_pandas(merged[list(COLUMNS)], schema=self._schema(), preserve_index=False)
+            tmp = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+            self._write(tmp, table)
+            os.replace(tmp, path)
+        rollups.safe_update(self, symbol, market, set(pd.to_datetime(new['date']).dt.date))
+
+    def upsert_rows(self, rows):
+        if not rows:
+            return
+        df = pd.DataFrame(rows)
+        for (symbol, market), part in df.groupby(['symbol', 'market'], sort=False):
+            self._merge_write(symbol, market, part)
+
+    def upsert_frame(self, symbol, market, df):
+        if df is None or df.empty:
+            return 0
+        new = pd.DataFrame({
+            'symbol': symbol,
+            'market': market,
+            'date': df.index.date,
+            **{k: (df[k].to_numpy() if k in df.columns else 0) for k in db.PRICE_FIELDS},
+        })
+        new['volume'] = new['volume'].fillna(0).astype('int64')
+        self._merge_write(symbol, market, new)
+        return len(new)
+
+    def symbols(self):
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for market in sorted(os.listdir(self.root)):
+            mdir = os.path.join(self.root, market)
+            for fn in sorted(os.listdir(mdir)):
+                if fn.endswith(self.suffix):
+                    out.append((fn[:-len(self.suffix)], market))
+        return out
+
+class ParquetPriceStore(_ColumnarPriceStore):
+    name = "parquet"
+    suffix = ".parquet"
+    ROW_GROUP_SIZE = 256  # ~1 trading year per group: date filters prune whole groups
+
+    def _read(self, path, start, end):
+        import pyarrow.parquet as pq
+        filters = []
+        if start is not None:
+            filters.append(('date', '>=', start))
+        if end is not None:
+            filters.append(('date', '<=', end))
+        return pq.read_table(path, filters=filters or None, memory_map=True)
+
+    def _write(self, path, table):
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, row_group_size=self.ROW_GROUP_SIZE, compression='zstd')
+
+class ArrowPriceStore(_ColumnarPriceStore):
+    name = "arrow"
+    suffix = ".arrow"
+
+    def _read(self, path, start, end):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        # files are date-sorted: a zero-copy slice instead of a filtered copy
+        dates = table.column('date')
+        lo = 0 if start is None else pc.sum(pc.less(dates, pa.scalar(start, pa.date32()))).as_py() or 0
+        hi = len(table) if end is None else pc.sum(pc.less_equal(dates, pa.scalar(end, pa.date32()))).as_py() or 0
+        return table.slice(lo, max(0, hi - lo))
+
+    def _write(self, path, table):
+        import pyarrow as pa
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+_BACKENDS = {
+    'sqlite': SQLitePriceStore,
+    'parquet': ParquetPriceStore,
+    'arrow': ArrowPriceStore,
+}
+
+_store: PriceStore | None = None
+
+def make_price_store(kind: str, root: str = PRICE_STORE_PATH) -> PriceStore:
+    cls = _BACKENDS.get(kind)
+    if cls is None:
+        raise ValueError(f"Unknown PRICE_STORE '{kind}' (expected one of {', '.join(_BACKENDS)})")
+    return cls() if cls is SQLitePriceStore else cls(root)
+
+def get_price_store() -> PriceStore:
+    """The configured process-wide price store."""
+    global _store
+    if _store is None:
+        _store = make_price_store(PRICE_STORE)
+    return _store
@@ -0,0 +1,92 @@
+"""In-process live quote cache (per-market TTL, bounded LRU, stale-while-revalidate).
+
+Concurrent misses for the same key are coalesced into one upstream call, so a hot
+symbol costs a single fetch per TTL interval regardless of how many requests hit it.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ..metrics import CACHE_REQUESTS
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+QUOTE_TTL = {
+    'US': _env_float('QUOTE_TTL_US', 5.0),
+    'HK': _env_float('QUOTE_TTL_HK', 5.0),
+    'CN': _env_float('QUOTE_TTL_CN', 5.0),
+}
+QUOTE_CACHE_SIZE = int(os.getenv('QUOTE_CACHE_SIZE', '1024'))
+# Serve an expired quote (and refresh in the background) while it is younger than this.
+QUOTE_MAX_STALE = _env_float('QUOTE_MAX_STALE', 60.0)
+QUOTE_STALE_WHILE_REVALIDATE = os.getenv('QUOTE_STALE_WHILE_REVALIDATE', '1').lower() not in ('0', 'false', 'no')
+
+class QuoteCache:
+    """Caches ``fetch(symbol, market)`` results keyed by (symbol, market)."""
+
+    def __init__(self, fetch, ttl: dict = None, maxsize: int = QUOTE_CACHE_SIZE,
+                 stale_while_revalidate: bool = QUOTE_STALE_WHILE_REVALIDATE, max_stale: float = QUOTE_MAX_STALE):
+        self._fetch = fetch
+        self._ttl = ttl or QUOTE_TTL
+        self._maxsize = maxsize
+        self._swr = stale_while_revalidate
+        self._max_stale = max_stale
+        self._entries: OrderedDict = OrderedDict()  # key -> (fetched_at, value)
+        self._inflight: dict = {}  # key -> threading.Event
+        self._lock = threading.Lock()
+
+    def _ttl_for(self, market: str) -> float:
+        return self._ttl.get(market.upper(), 5.0)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key):
+        """Fetch ``key`` upstream unless another thread already is; wait for its result."""
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait()
+            return
+        try:
+            self._store(key, self._fetch(*key))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def get(self, symbol: str, market: str):
+        key = (symbol, market)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            age = now - entry[0]
+            if age < self._ttl_for(market):
+                CACHE_REQUESTS.inc('quote', 'hit')
+                return entry[1]
+            if self._swr and entry[1] is not None and age < self._max_stale:
+                if key not in self._inflight:
+                    threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+                CACHE_REQUESTS.inc('quote', 'stale')
+                return entry[1]
+        CACHE_REQUESTS.inc('quote', 'miss')
+        self._refresh(key)
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
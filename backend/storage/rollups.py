@@ -0,0 +1,136 @@
+"""Weekly / monthly / N-day OHLCV rollups maintained from the daily bars.
+
+Intervals come from ``ROLLUP_INTERVALS`` (default ``1wk,1mo``; ``Nd`` adds N-day
+buckets aligned to 1970-01-01). Weeks start on Monday, months on the 1st.
+
+Every price store write calls ``update`` with the dates it touched: only the periods
+containing those dates are re-aggregated from the daily bars (one range read), so
+overwrites and the still-moving intraday bar stay correct without full rebuilds.
+A symbol whose rollups were never built for the configured interval set (history
+stored before this existed) is rebuilt once from its full daily history.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+from datetime import date, timedelta
+
+from . import db
+from ..lazy import lazy_import
+from ..metrics import CACHE_REQUESTS
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+log = logging.getLogger(__name__)
+
+_INTERVAL = re.compile(r"^(1wk|1mo|[1-9][0-9]*d)$")
+
+def parse_intervals(spec: str) -> tuple[str, ...]:
+    out = []
+    for item in spec.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if not _INTERVAL.match(item) or item == "1d":
+            raise ValueError(f"invalid rollup interval {item!r} (expected 1wk, 1mo or Nd with N > 1)")
+        out.append(item)
+    return tuple(dict.fromkeys(out))
+
+ROLLUP_INTERVALS = parse_intervals(os.getenv("ROLLUP_INTERVALS", "1wk,1mo"))
+_SPEC = ",".join(ROLLUP_INTERVALS)
+_FULL_HISTORY = (date(1900, 1, 1), date(2200, 1, 1))
+
+def _period_keys(days: np.ndarray, interval: str) -> np.ndarray:
+    """Period start (datetime64[D]) for each datetime64[D] date."""
+    ordinals = days.astype(np.int64)
+    if interval == "1wk":
+        # 1970-01-01 was a Thursday: (ordinal + 3) % 7 is the Monday-based weekday
+        return (ordinals - (ordinals + 3) % 7).astype("datetime64[D]")
+    if interval == "1mo":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    n = int(interval[:-1])
+    return (ordinals - ordinals % n).astype("datetime64[D]")
+
+def period_start(d: date, interval: str) -> date:
+    return _period_keys(np.array([d], dtype="datetime64[D]"), interval)[0].astype(date)
+
+def period_end(start: date, interval: str) -> date:
+    """Last calendar day of the period beginning at ``start``."""
+    if interval == "1wk":
+        return start + timedelta(days=6)
+    if interval == "1mo":
+        return (pd.Timestamp(start) + pd.offsets.MonthEnd(0)).date()
+    return start + timedelta(days=int(interval[:-1]) - 1)
+
+def aggregate(df: pd.DataFrame, symbol: str, market: str, interval: str) -> list[dict]:
+    """Rollup rows for a date-sorted daily frame (DatetimeIndex, OHLCV columns)."""
+    if df.empty:
+        return []
+    days = df.index.values.astype("datetime64[D]")
+    frame = pd.DataFrame({
+        "period_start": _period_keys(days, interval),
+        "date": days,
+        **{k: df[k].to_numpy() for k in db.PRICE_FIELDS if k in df.columns},
+    })
+    agg = frame.groupby("period_start", sort=True).agg(
+        open=("open", "first"), high=("high", "max"), low=("low", "min"), close=("close", "last"),
+        volume=("volume", "sum"), first_date=("date", "min"), last_date=("date", "max"), bars=("date", "size"),
+    )
+    return [
+        {"symbol": symbol, "market": market, "interval": interval, "period_start": ps.date(),
+         "open": o, "high": h, "low": l, "close": c, "volume": int(v),
+         "first_date": fd.date(), "last_date": ld.date(), "bars": int(b)}
+        for ps, o, h, l, c, v, fd, ld, b in zip(
+            agg.index, agg["open"].tolist(), agg["high"].tolist(), agg["low"].tolist(), agg["close"].tolist(),
+            agg["volume"].tolist(), agg["first_date"], agg["last_date"], agg["bars"].tolist())
+    ]
+
+def rebuild(store, symbol: str, market: str):
+    """Recompute every configured interval of one symbol from its full daily history."""
+    df = store.load_frame(symbol, market, *_FULL_HISTORY)
+    rows = []
+    for interval in ROLLUP_INTERVALS:
+        rows += aggregate(df, symbol, market, interval)
+    db.upsert_rollups(rows)
+    db.mark_rollups_built(symbol, market, _SPEC)
+
+def update(store, symbol: str, market: str, dates):
+    """Re-aggregate the periods containing ``dates`` after a write of those daily bars."""
+    if not ROLLUP_INTERVALS or len(dates) == 0:
+        return
+    if db.rollups_built_for(symbol, market) != _SPEC:
+        rebuild(store, symbol, market)
+        return
+    lo, hi = min(dates), max(dates)
+    ranges = {iv: (period_start(lo, iv), period_end(period_start(hi, iv), iv)) for iv in ROLLUP_INTERVALS}
+    df = store.load_frame(symbol, market, min(r[0] for r in ranges.values()), max(r[1] for r in ranges.values()))
+    rows = []
+    for interval, (start, end) in ranges.items():
+        touched = set(_period_keys(np.asarray(list(dates), dtype="datetime64[D]"), interval).astype(date))
+        part = df[(df.index >= pd.Timestamp(start)) & (df.index <= pd.Timestamp(end))] if not df.empty else df
+        rows += [r for r in aggregate(part, symbol, market, interval) if r["period_start"] in touched]
+    db.upsert_rollups(rows)
+
+def safe_update(store, symbol: str, market: str, dates):
+    """``update`` for the write path: a rollup failure must not fail the daily write."""
+    try:
+        update(store, symbol, market, dates)
+    except Exception:
+        log.warning("rollups: update of %s/%s failed", market, symbol, exc_info=True)
+
+def load_rollup_frame(store, symbol: str, market: str, interval: str, start: date, end: date) -> pd.DataFrame:
+    """Rollup bars of ``interval`` overlapping [start, end], indexed by period start; empty if none."""
+    built = db.rollups_built_for(symbol, market) == _SPEC
+    CACHE_REQUESTS.inc('rollups', 'hit' if built else 'miss')
+    if not built:
+        rebuild(store, symbol, market)
+    rows = db.load_rollups(symbol, market, interval, start, end)
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df.set_index(pd.to_datetime(df["period_start"]), inplace=True)
+    for col in ("first_date", "last_date"):
+        df[col] = df[col].astype(str)  # ISO strings, like the row format's date
+    return df.drop(columns=["symbol", "market", "interval", "period_start"])
@@ -0,0 +1,65 @@
+"""Async snapshot cache (TTL + stale-while-revalidate) for slow upstream lookups.
+
+Like ``QuoteCache`` but for coroutines: a fresh entry is returned as is, a stale
+one (younger than ``max_stale``) is returned immediately while a single background
+task refreshes it, and only a missing / too old entry makes the caller wait. If
+a refresh fails, the previous snapshot (of any age) keeps being served.
+"""
+import asyncio
+import logging
+import time
+
+from ..metrics import CACHE_REQUESTS
+
+log = logging.getLogger(__name__)
+
+class SnapshotCache:
+    """Caches ``await fetch(*key)`` results keyed by the positional arguments."""
+
+    def __init__(self, fetch, ttl: float, max_stale: float, name: str = "snapshot"):
+        self.name = name  # cache label in metrics
+        self._fetch = fetch
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._entries: dict = {}  # key -> (fetched_at, value)
+        self._inflight: dict = {}  # key -> asyncio.Task
+
+    async def _run(self, key):
+        try:
+            value = await self._fetch(*key)
+            self._entries[key] = (time.monotonic(), value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh(self, key) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._run(key))
+            task.add_done_callback(self._log_failure)
+        return task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("snapshot refresh failed: %r", task.exception())
+
+    async def get(self, *key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self._ttl:
+                CACHE_REQUESTS.inc(self.name, 'hit')
+                return entry[1]
+            if age < self._max_stale:
+                self._refresh(key)
+                CACHE_REQUESTS.inc(self.name, 'stale')
+                return entry[1]
+        CACHE_REQUESTS.inc(self.name, 'miss')
+        try:
+            # shield: a cancelled request must not abort the refresh other callers share
+            return await asyncio.shield(self._refresh(key))
+        except Exception:
+            if entry is not None:
+                return entry[1]
+            raise
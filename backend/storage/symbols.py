@@ -0,0 +1,110 @@
+"""Symbol metadata: yfinance ticker mapping plus persisted names and currency.
+
+``market_symbol`` is the single place that maps (symbol, market) to the yfinance
+ticker. Names / currency come from the slow ``Ticker.info`` scrape once per symbol
+and are stored in the ``symbol_meta`` table, so they survive restarts and are shared
+by every worker; a small in-process map saves the query on repeated lookups.
+``resolve_many`` reads all requested pairs in one query and scrapes the missing
+ones concurrently.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from .db import load_symbol_meta, upsert_symbol_meta
+from ..resilience import YFINANCE
+from ..metrics import CACHE_REQUESTS
+
+# names rarely change; symbols without a name are retried sooner
+SYMBOL_META_TTL = timedelta(days=float(os.getenv("SYMBOL_META_TTL_DAYS", "30")))
+SYMBOL_META_RETRY = timedelta(hours=float(os.getenv("SYMBOL_META_RETRY_HOURS", "24")))
+SYMBOL_META_WORKERS = int(os.getenv("SYMBOL_META_WORKERS", "8"))
+
+def exchange_suffix(symbol: str, market: str) -> str:
+    if market == "HK":
+        return "" if symbol.endswith(".HK") else ".HK"
+    if market == "CN":
+        # Simplified suffix mapping (could use akshare for exact exchange)
+        return ".SS" if symbol.startswith("6") else ".SZ"
+    return ""
+
+def market_symbol(symbol: str, market: str) -> str:
+    """yfinance ticker for (symbol, market), e.g. ('0700', 'HK') -> '0700.HK'."""
+    return symbol + exchange_suffix(symbol, market)
+
+_memo: dict[tuple, dict] = {}
+_lock = threading.Lock()
+
+def _expired(meta: dict, now: datetime) -> bool:
+    ttl = SYMBOL_META_TTL if meta.get('name_en') else SYMBOL_META_RETRY
+    return now - meta['refreshed_at'] >= ttl
+
+def _fetch_meta(symbol: str, market: str) -> dict:
+    """Scrape name / currency for one symbol (blocking; upstream errors propagate)."""
+    import yfinance as yf
+    t = yf.Ticker(market_symbol(symbol, market))
+    info = getattr(t, 'info', None) or {}
+    name = info.get('shortName') or info.get('longName')
+    currency = info.get('currency')
+    if not name or not currency:
+        fi = getattr(t, 'fast_info', None) or {}
+        if isinstance(fi, dict):
+            name = name or fi.get('shortName') or fi.get('longName')
+            currency = currency or fi.get('currency')
+    return {'name_en': name, 'currency': currency}
+
+def _lookup(pair: tuple) -> dict | None:
+    try:
+        return YFINANCE.call_sync(_fetch_meta, *pair)
+    except Exception:
+        return None  # not stored: retried on the next lookup
+
+def resolve_many(pairs: list[tuple]) -> dict[tuple, dict]:
+    """Metadata for every (symbol, market) pair; unknown ones are scraped concurrently.
+
+    Pairs whose upstream lookup failed map to a row without names.
+    """
+    now = datetime.utcnow()
+    pairs = list(dict.fromkeys(pairs))
+    with _lock:
+        out = {p: _memo[p] for p in pairs if p in _memo and not _expired(_memo[p], now)}
+    CACHE_REQUESTS.inc('symbol_meta', 'hit', amount=len(out))
+    todo = [p for p in pairs if p not in out]
+    failed = set()
+    if todo:
+        stored = load_symbol_meta(todo)
+        fresh = {p: m for p, m in stored.items() if not _expired(m, now)}
+        out.update(fresh)
+        todo = [p for p in todo if p not in fresh]
+        CACHE_REQUESTS.inc('symbol_meta', 'stale', amount=sum(1 for p in todo if p in stored))
+        CACHE_REQUESTS.inc('symbol_meta', 'miss', amount=sum(1 for p in todo if p not in stored))
+    if todo:
+        if len(todo) == 1:
+            found = [_lookup(todo[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(SYMBOL_META_WORKERS, len(todo))) as pool:
+                found = list(pool.map(_lookup, todo))
+        rows = []
+        for (symbol, market), res in zip(todo, found):
+            row = {'symbol': symbol, 'market': market, 'yf_symbol': market_symbol(symbol, market),
+                   'suffix': exchange_suffix(symbol, market), 'name_en': None,
+                   # Placeholder: Chinese name resolution could be added via akshare later.
+                   'name_zh': None, 'currency': None, 'refreshed_at': now}
+            if res is not None:
+                rows.append({**row, **res})
+                out[(symbol, market)] = rows[-1]
+            else:
+                # keep serving a stale stored row over nothing
+                out[(symbol, market)] = stored.get((symbol, market), row)
+                failed.add((symbol, market))
+        upsert_symbol_meta(rows)
+    with _lock:
+        _memo.update((p, m) for p, m in out.items() if p not in failed)
+    return out
+
+def resolve(symbol: str, market: str) -> dict:
+    return resolve_many([(symbol, market)])[(symbol, market)]
+
+def company_name(symbol: str, market: str) -> str | None:
+    return resolve(symbol, market)['name_en']
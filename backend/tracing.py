@@ -0,0 +1,243 @@
+"""Per-request phase timings (``Server-Timing``) and an opt-in sampling profiler.
+
+``span(name)`` / ``@timed(name)`` time a phase of the current request. Spans are
+collected in a context variable, so they also work inside ``asyncio.to_thread``
+and Starlette's threadpool (contexts are copied, the collector object is shared).
+Outside a request they cost one ``ContextVar.get``.
+
+``TimingMiddleware`` adds ``Server-Timing: fetch_remote;dur=812.4, ..., total;dur=901.2``
+to every HTTP response. With ``?profile=1`` (and ``PROFILE_ALLOWED=1``, off by
+default), the request is sampled every ``PROFILE_INTERVAL_MS`` and the response body
+is replaced by the profile: collapsed stacks (``profile_format=collapsed``, for
+flamegraph.pl / speedscope import) or a speedscope JSON document
+(``profile_format=speedscope``). The profile response keeps the app's status code
+(also in ``x-profile-status``). Profiling stops after ``PROFILE_MAX_SECONDS``: the
+request coroutine is cancelled and the partial profile is returned with status 504
+and ``x-profile-status: timeout``; a sync endpoint already running in the threadpool
+cannot be cancelled and runs to completion in the background. Profiling is refused
+(400) for ``text/event-stream`` responses, which only end when the client goes away.
+Sampled threads are the event loop thread plus every thread that entered a span
+of the request, so concurrent requests on the event loop may show up too.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").lower() not in ("0", "false", "no")
+PROFILE_ALLOWED = os.getenv("PROFILE_ALLOWED", "0").lower() not in ("0", "false", "no")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+
+class RequestTimings:
+    def __init__(self):
+        self.phases: dict[str, list] = {}  # name -> [total seconds, count]
+        self.threads: set[int] = set()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header(self, total: float) -> str:
+        parts = []
+        with self._lock:
+            phases = list(self.phases.items())
+        for name, (seconds, count) in phases:
+            desc = f';desc="x{count}"' if count > 1 else ""
+            parts.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as phase ``name`` of the current request (no-op outside one)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.threads.add(threading.get_ident())
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - t0)
+
+def timed(name: str):
+    """Decorator form of ``span`` for sync and async functions."""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# ---------------- sampling profiler -----------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    # keep paths short: package-relative for our code, basename otherwise
+    marker = os.sep + "backend" + os.sep
+    short = "backend" + os.sep + path.split(marker, 1)[1] if marker in path else os.path.basename(path)
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+class Sampler:
+    """Collects stack samples of a dynamic set of threads from a background thread."""
+
+    def __init__(self, threads: set[int], interval: float = PROFILE_INTERVAL):
+        self.threads = threads
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.is_set():
+            frames = sys._current_frames()
+            for tid in list(self.threads):
+                frame = frames.get(tid)
+                if frame is None or tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: ``root;child;leaf count`` per line."""
+        return "".join(f"{';'.join(stack)} {n}\n" for stack, n in self.stacks.most_common())
+
+    def speedscope(self, name: str) -> dict:
+        frames: dict[str, int] = {}
+        samples, weights = [], []
+        for stack, n in self.stacks.items():
+            samples.append([frames.setdefault(label, len(frames)) for label in stack])
+            weights.append(n * self.interval * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": label} for label in frames]},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "milliseconds",
+                "startValue": 0, "endValue": sum(weights),
+                "samples": samples, "weights": weights,
+            }],
+            "name": name,
+            "exporter": "stock-mcpilot",
+        }
+
+# ---------------- middleware -----------------
+
+class _StreamingResponse(Exception):
+    """Raised into the app when a profiled request turns out to be an event stream."""
+
+class TimingMiddleware:
+    """Pure ASGI middleware: Server-Timing header and ``?profile=1`` handling."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if PROFILE_ALLOWED and query.get("profile", ["0"])[0] in ("1", "true"):
+            return await self._profile(scope, receive, send, query.get("profile_format", ["collapsed"])[0])
+        if not SERVER_TIMING:
+            return await self.app(scope, receive, send)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        t0 = time.perf_counter()
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(time.perf_counter() - t0).encode()))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+
+    async def _profile(self, scope, receive, send, fmt: str):
+        timings = RequestTimings()
+        timings.threads.add(threading.get_ident())  # the event loop thread
+        token = _current.set(timings)
+        status = {"code": 500}
+
+        async def _discard(message):
+            # the profile replaces the normal response body
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if dict(message.get("headers", [])).get(b"content-type", b"").startswith(b"text/event-stream"):
+                    raise _StreamingResponse()
+
+        t0 = time.perf_counter()
+        try:
+            with Sampler(timings.threads) as sampler:
+                await asyncio.wait_for(self.app(scope, receive, _discard), PROFILE_MAX_SECONDS)
+        except _StreamingResponse:
+            body = b"profile=1 is not supported for streaming (text/event-stream) responses"
+            await send({"type": "http.response.start", "status": 400, "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        except asyncio.TimeoutError:
+            status["code"] = "timeout"  # threadpool work of a sync endpoint keeps running
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - t0
+        name = f"{scope['method']} {scope['path']}"
+        if fmt == "speedscope":
+            body = json.dumps(sampler.speedscope(name)).encode()
+            content_type = b"application/json"
+        else:
+            body = sampler.collapsed().encode()
+            content_type = b"text/plain; charset=utf-8"
+        code = 504 if status["code"] == "timeout" else status["code"]
+        await send({"type": "http.response.start", "status": code, "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+            (b"server-timing", timings.header(total).encode()),
+            (b"x-profile-status", str(status["code"]).encode()),
+            (b"x-profile-samples", str(sampler.samples).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
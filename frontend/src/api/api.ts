@@ -13,8 +13,9 @@ export interface StockRow { date: string; open: number; high: number; low: numbe
 export interface StockSummary { count: number; mean_close: number; vol_mean: number; return_pct: number; max_drawdown_pct: number; volatility_pct: number }
 export interface StockDailyResponse { symbol: string; market: string; start: string; end: string; rows: StockRow[]; summary: StockSummary; company_name_en?: string | null; company_name_zh?: string | null }
 
-export async function fetchStock(symbol: string, market: string, days = 60) {
-  const { data } = await client.get<StockDailyResponse>(`/stocks/${symbol}`, { params: { market, days } })
+export async function fetchStock(symbol: string, market: string, days = 60, maxPoints?: number, downsample: 'lttb' | 'ohlc' = 'lttb') {
+  const params = maxPoints ? { market, days, max_points: maxPoints, downsample } : { market, days }
+  const { data } = await client.get<StockDailyResponse>(`/stocks/${symbol}`, { params })
   return data
 }
 